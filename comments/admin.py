@@ -1,9 +1,24 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _, ngettext
 
-# Register your models here.
 from .models import ProductComment
 
+
 @admin.register(ProductComment)
-class Admin(admin.ModelAdmin):
-    pass
+class ProductCommentAdmin(admin.ModelAdmin):
+    list_display = ['fullname', 'product', 'user', 'score', 'is_verified', 'datetime_created']
+    list_filter = ['is_verified', 'score', 'is_admin', 'datetime_created']
+    list_select_related = ['product', 'user']
+    search_fields = ['fullname', 'email', 'body']
+    raw_id_fields = ['product', 'user', 'parent']
+    actions = ['verify_comments', 'unverify_comments']
+
+    @admin.action(description=_('Verify selected comments'), permissions=['change'])
+    def verify_comments(self, request, queryset):
+        count = ProductComment.objects.set_verified(queryset.values('pk'), True)
+        self.message_user(request, ngettext('%d comment verified.', '%d comments verified.', count) % count)
 
+    @admin.action(description=_('Unverify selected comments'), permissions=['change'])
+    def unverify_comments(self, request, queryset):
+        count = ProductComment.objects.set_verified(queryset.values('pk'), False)
+        self.message_user(request, ngettext('%d comment unverified.', '%d comments unverified.', count) % count)
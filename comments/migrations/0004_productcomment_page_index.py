@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_productcomment_score_applied'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcomment',
+            index=models.Index(fields=['product', 'is_verified', 'parent', 'datetime_created'], name='product_comments_page_idx'),
+        ),
+    ]
@@ -1,12 +1,14 @@
-from django.db import models
-from django.db.models import Sum, Count, Value
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import Case, When, Value, F
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
-from django.db.models.functions import Coalesce
 
 from jalali_date import datetime2jalali, date2jalali
 
-from products.models import Product
+from products.models import Product, ProductVariant
+from products.cache import invalidate_variants
 
 
 class ActiveCommentManager(models.Manager):
@@ -15,6 +17,38 @@ class ActiveCommentManager(models.Manager):
         return super().get_queryset().filter(is_verified=True)
 
 
+class ProductCommentManager(models.Manager):
+
+    def set_verified(self, comment_ids, verified):
+        """Verify or unverify given comments in bulk. Counters of every affected product are changed with a single
+           UPDATE, instead of saving comments one by one. Returns number of changed comments.
+        """
+        with transaction.atomic():
+            comments = list(
+                self.select_for_update().filter(pk__in=comment_ids, is_verified=not verified)
+                .values_list('id', 'product_id', 'parent_id', 'score', 'score_applied')
+            )
+            if not comments:
+                return 0
+            self.filter(pk__in=[comment[0] for comment in comments]).update(
+                is_verified=verified,
+                score_applied=Case(When(score__isnull=False, then=Value(verified)), default=F('score_applied'))
+            )
+            sign = 1 if verified else -1
+            counters = defaultdict(lambda: {'comments_count': 0, 'score_sum': 0, 'rated_count': 0})
+            for _id, product_id, parent_id, score, score_applied in comments:
+                if parent_id is None:
+                    counters[product_id]['comments_count'] += sign
+                if score and score_applied != verified:
+                    counters[product_id]['score_sum'] += sign * score
+                    counters[product_id]['rated_count'] += sign
+            # products are always locked in the same order, so concurrent moderations can not deadlock
+            for product_id in sorted(counters):
+                Product.objects.update_counters(product_id, **counters[product_id])
+            invalidate_variants(ProductVariant.objects.filter(product_id__in=counters).values_list('id', 'sku'))
+        return len(comments)
+
+
 class AbstractComment(models.Model):
     COMMENT_SCORE_VERY_BAD = 1
     COMMENT_SCORE_BAD = 2
@@ -63,8 +97,21 @@ class AbstractComment(models.Model):
     objects = models.Manager()
     active_manager = ActiveCommentManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered to find out verification changes on save without querying database again
+        if 'is_verified' in field_names:
+            instance._db_is_verified = instance.is_verified
+        return instance
+
     def _get_verification_status(self):
-        db_value = self.__class__.objects.only('is_verified').get(pk=self.id).is_verified
+        if not self.pk:
+            return 'verified' if self.is_verified else None
+        if hasattr(self, '_db_is_verified'):
+            db_value = self._db_is_verified
+        else:
+            db_value = self.__class__.objects.only('is_verified').get(pk=self.id).is_verified
         if (not db_value) and self.is_verified:
             return 'verified'
         if db_value and (not self.is_verified):
@@ -87,6 +134,16 @@ class ProductComment(AbstractComment):
     pros = models.CharField(max_length=128, verbose_name=_('Pros'), blank=True)
     cons = models.CharField(max_length=128, verbose_name=_('Cons'), blank=True)
 
+    objects = ProductCommentManager()
+
+    class Meta:
+        indexes = [
+            # comments of a product are paginated by (datetime_created, id)
+            models.Index(
+                fields=['product', 'is_verified', 'parent', 'datetime_created'], name='product_comments_page_idx'
+            ),
+        ]
+
     # todo: add a field to store user bought product or not
     def get_pros(self):
         return self.pros.split(',')
@@ -94,25 +151,29 @@ class ProductComment(AbstractComment):
     def get_cons(self):
         return self.cons.split(',')
 
-    def _update_product_score(self):
-        """Update related product if needed"""
-        if self.pk and self.score and (verification_status := self._get_verification_status()):
-            rated_comments = self.product.comments(manager='active_manager').filter(score_applied=True).aggregate(
-                score_sum=Coalesce(Sum('score'), Value(0)), comments_count=Coalesce(Count('id'), Value(0))
-            )
-            if verification_status == 'verified' and not self.score_applied:
-                self.product.score = round(
-                    (rated_comments['score_sum'] + self.score) / (rated_comments['comments_count'] + 1), 1
-                )
-                self.product.save()
-                self.score_applied = True
-            elif verification_status == 'unverified' and self.score_applied:
-                self.product.score = round(
-                    (rated_comments['score_sum'] - self.score) / (rated_comments['comments_count'] - 1), 1
-                )
-                self.product.save()
-                self.score_applied = False
+    def _update_product_counters(self, verification_status):
+        """Apply verification change to comments count and score of product. The change is claimed on the comment row
+           first, so when moderators verify the same comment concurrently only one of them updates the product.
+           Returns False when the claim is lost.
+        """
+        verified = verification_status == 'verified'
+        if self.pk and not self.__class__.objects.filter(pk=self.pk, is_verified=not verified).update(
+            is_verified=verified
+        ):
+            return False
+        sign = 1 if verified else -1
+        counters = {'comments_count': sign} if self.parent_id is None else {}
+        if self.score and self.score_applied != verified:
+            counters.update(score_sum=sign * self.score, rated_count=sign)
+            self.score_applied = verified
+        Product.objects.update_counters(self.product_id, **counters)
+        return True
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
-        self._update_product_score()
-        super().save(force_insert=False, force_update=False, using=None, update_fields=None)
+        verification_status = self._get_verification_status()
+        with transaction.atomic():
+            if verification_status and not self._update_product_counters(verification_status):
+                # concurrent verification won, its score_applied is kept instead of the stale one of this instance
+                self.refresh_from_db(fields=['is_verified', 'score_applied'])
+            super().save(force_insert, force_update, using, update_fields)
+        self._db_is_verified = self.is_verified
@@ -0,0 +1,102 @@
+import binascii
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """Paginator that uses an already known (stored) count instead of running COUNT(*) on object list"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset pagination over (datetime_created, id) from newest to oldest. Pages are addressed by a cursor of the
+       item they start after (or end before), so a deep page costs the same as the first one and no COUNT(*) is needed.
+    """
+    AFTER = 'a'
+    BEFORE = 'b'
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    @staticmethod
+    def encode_cursor(direction, item):
+        value = f'{direction}|{item.datetime_created.isoformat()}|{item.id}'
+        return urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            value = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            direction, datetime_created, item_id = value.split('|')
+            return direction, datetime.fromisoformat(datetime_created), int(item_id)
+        except (ValueError, binascii.Error):
+            raise InvalidCursor(cursor)
+
+    def page(self, cursor=None):
+        if not cursor:
+            items = list(self.object_list.order_by('-datetime_created', '-id')[:self.per_page + 1])
+            has_next, has_previous = len(items) > self.per_page, False
+        else:
+            direction, datetime_created, item_id = self.decode_cursor(cursor)
+            if direction == self.AFTER:
+                items = list(
+                    self.object_list.filter(
+                        Q(datetime_created__lt=datetime_created) | Q(datetime_created=datetime_created, id__lt=item_id)
+                    ).order_by('-datetime_created', '-id')[:self.per_page + 1]
+                )
+                has_next, has_previous = len(items) > self.per_page, True
+            elif direction == self.BEFORE:
+                items = list(
+                    self.object_list.filter(
+                        Q(datetime_created__gt=datetime_created) | Q(datetime_created=datetime_created, id__gt=item_id)
+                    ).order_by('datetime_created', 'id')[:self.per_page + 1]
+                )
+                has_next, has_previous = True, len(items) > self.per_page
+                items = items[:self.per_page][::-1]
+            else:
+                raise InvalidCursor(cursor)
+        items = items[:self.per_page]
+        return CursorPage(
+            items,
+            self.encode_cursor(self.AFTER, items[-1]) if has_next and items else None,
+            self.encode_cursor(self.BEFORE, items[0]) if has_previous and items else None,
+        )
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import Product
+from products.signals import invalidate_product_pages
+from .models import ProductComment
+
+
+@receiver(post_save, sender=ProductComment)
+def product_comment_saved(sender, instance, created, **kwargs):
+    # new comments are not shown until an admin verifies them
+    if created and not instance.is_verified:
+        return
+    invalidate_product_pages(instance.product_id)
+
+
+@receiver(post_delete, sender=ProductComment)
+def product_comment_deleted(sender, instance, **kwargs):
+    if instance.is_verified:
+        Product.objects.update_counters(
+            instance.product_id,
+            comments_count=-1 if instance.parent_id is None else 0,
+            score_sum=-instance.score if instance.score_applied else 0,
+            rated_count=-1 if instance.score_applied else 0,
+        )
+        invalidate_product_pages(instance.product_id)
@@ -1,3 +1,63 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from products.models import Product, ProductCategory
+from .models import ProductComment
+from .pagination import CursorPaginator, InvalidCursor
+
+
+class TestCursorPaginator(SimpleTestCase):
+
+    def test_cursor_round_trip(self):
+        comment = SimpleNamespace(datetime_created=datetime(2024, 1, 2, 8, 6, 30, 125, tzinfo=timezone.utc), id=42)
+        cursor = CursorPaginator.encode_cursor(CursorPaginator.AFTER, comment)
+        self.assertEqual(
+            CursorPaginator.decode_cursor(cursor), (CursorPaginator.AFTER, comment.datetime_created, comment.id)
+        )
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', 'YXw', '!!'):
+            with self.assertRaises(InvalidCursor):
+                CursorPaginator.decode_cursor(cursor)
+
+
+class TestProductCommentVerification(TransactionTestCase):
+
+    def setUp(self):
+        category = ProductCategory.objects.create(name='graphic cards', slug='graphic-cards')
+        self.product = Product.objects.create(
+            name='RTX 4090', slug='rtx-4090', description='lorem ...', category=category
+        )
+        self.comment = ProductComment.objects.create(
+            product=self.product, fullname='Ali', email='ali@example.com', body='lorem ...', score=4
+        )
+
+    def test_concurrent_verifications_apply_once(self):
+        loaded = threading.Barrier(2)
+
+        def verify():
+            try:
+                comment = ProductComment.objects.get(pk=self.comment.pk)
+                loaded.wait()
+                comment.is_verified = True
+                comment.save()
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=verify) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(
+            (self.product.comments_count, self.product.score_sum, self.product.rated_count, self.product.score),
+            (1, 4, 1, 4)
+        )
+        self.comment.refresh_from_db()
+        self.assertTrue(self.comment.is_verified)
+        self.assertTrue(self.comment.score_applied)
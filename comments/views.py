@@ -1,21 +1,55 @@
 from django.contrib import messages
+from django.db.models import Prefetch
+from django.http import Http404
 from django.views.generic import ListView
 from django.views.generic.edit import BaseFormView
 from django.utils.translation import gettext_lazy as _
 
 from .forms import ProductCommentForm
+from .models import ProductComment
+from .pagination import CountedPaginator, CursorPaginator, InvalidCursor
 
 
 class ProductCommentPartial(ListView, BaseFormView):
     template_name = 'comments/comments.html'
     form_class = ProductCommentForm
     paginate_by = 3
+    paginator_class = CountedPaginator
+    # keyset pagination with ?cursor=, ?page= links are still served with offset pagination
+    cursor_pagination = False
+    cursor_kwarg = 'cursor'
     product_variant = None
     context_object_name = 'comments'
     success_message = _('Your comment submitted successfully, it will be shown when it become verified.')
 
     def get_queryset(self):
-        return self.product_variant.product.comments.all()
+        """Verified top level comments, the paginator slices them so only replies of visible page are prefetched"""
+        return (
+            self.product_variant.product.comments(manager='active_manager')
+            .filter(parent__isnull=True).select_related('user')
+            .prefetch_related(Prefetch('replies', ProductComment.active_manager.order_by('datetime_created', 'id')))
+            .order_by('-datetime_created', '-id')
+        )
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return super().get_paginator(
+            queryset, per_page, count=self.product_variant.product.comments_count, **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cursor_pagination or self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404(_('Invalid cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = isinstance(context['paginator'], CursorPaginator)
+        return context
 
     def form_valid(self, form):
         commenter_user = self.request.user if self.request.user.is_authenticated else None
@@ -37,6 +71,8 @@ class ProductCommentPartial(ListView, BaseFormView):
         return super().post(request, *args, **kwargs)
 
     def get_success_url(self):
+        if cursor := self.request.GET.get(self.cursor_kwarg):
+            return self.product_variant.get_absolute_url() + f'?{self.cursor_kwarg}={cursor}'
         return self.product_variant.get_absolute_url() + f'?page={self.request.GET.get("page", 1)}'
 
     def save_info(self, form):
@@ -53,7 +89,7 @@ class ProductCommentPartial(ListView, BaseFormView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['comments_list'] = self.object_list
+        kwargs['comments_list'] = self.product_variant.product.comments(manager='active_manager').all()
         return kwargs
 
     def form_invalid(self, form):
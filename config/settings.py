@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',
     # third party apps
     'debug_toolbar',
     'phonenumber_field',
@@ -119,6 +120,18 @@ CACHES = {
 
 CACHE_TTL = 60 * 10
 
+# seconds each process trusts its own snapshot of active promotions, edits from other processes show up after it
+ACTIVE_PROMOTIONS_LOCAL_TTL = 30
+# search suggestions are served from an in-process index that is rebuilt after this many seconds
+SUGGESTION_INDEX_TTL = 60 * 30
+SUGGESTION_INDEX_MAX_ENTRIES = 200_000
+# seconds each process keeps its category tree used by menus and breadcrumbs
+CATEGORY_TREE_LOCAL_TTL = 60 * 5
+# home page sections older than this are built again by the next build_home_sections --stale run
+HOME_SECTIONS_TTL = 60 * 60
+# finished sitemaps are served from cache for this many seconds
+SITEMAP_CACHE_TTL = 60 * 60 * 6
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -195,6 +208,17 @@ if DEBUG:
 # sorl-thumbnail settings
 THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.redis_kvstore.KVStore'
 THUMBNAIL_REDIS_HOST = REDIS_CACHE_HOST
+# sizes of product images generated in background on upload, templates get them with resolve_thumbnails
+PRODUCT_IMAGE_SIZES = {
+    'large': ('800x800', {'crop': 'center'}),
+}
+# smaller widths of every size and modern formats offered to browsers by srcset, formats this install can't write
+# (AVIF needs a Pillow with an AVIF encoder and sorl support) are skipped
+PRODUCT_IMAGE_SRCSET_WIDTHS = (200, 400)
+PRODUCT_IMAGE_FORMATS = ('AVIF', 'WEBP')
+THUMBNAIL_WORKERS = 2
+# seconds a missing thumbnail found while rendering is not queued again, generating it takes less
+THUMBNAIL_QUEUED_TTL = 60 * 5
 
 # tiny mce settings
 TINYMCE_DEFAULT_CONFIG = {
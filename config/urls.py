@@ -19,12 +19,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 
+from products.views import SitemapView, ProductSitemapView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('tinymce/', include('tinymce.urls')),
     path('', include('pages.urls', namespace='pages')),
     path('accounts/', include('accounts.urls', namespace='accounts')),
     path('products/', include('products.urls', namespace='products')),
+    # sitemaps only list urls below their own path, so they are served from root
+    path('sitemap.xml', SitemapView.as_view(), name='sitemap'),
+    path('sitemap-products-<int:page>.xml', ProductSitemapView.as_view(), name='sitemap-products'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,7 +1,13 @@
-from django.shortcuts import render
-
+from django.utils.translation import get_language
 from django.views.generic import TemplateView
 
+from products.home_sections import get_home_sections
+
 
 class HomePageView(TemplateView):
     template_name = 'pages/home-page.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['sections'] = get_home_sections(get_language())
+        return context
@@ -19,7 +19,8 @@ class ActivePromotionFilter(admin.SimpleListFilter):
         ]
 
     def queryset(self, request, queryset):
-        active_promotions = models.ProductPromotion.active_manager.values_list('id', flat=True)
+        # admins see the database, not the snapshot of this process that may lag behind it
+        active_promotions = models.ProductPromotion.active_manager.values('id')
         if self.value() == 'true':
             return queryset.filter(id__in=active_promotions)
         elif self.value() == 'false':
@@ -112,7 +113,13 @@ class ProductAttributeValueAdmin(trans_admin.TranslationAdmin):
 
 @admin.register(models.ProductCategory)
 class ProductCategoryAdmin(trans_admin.TranslationAdmin):
-    pass  # todo: add mptt later on
+    list_display = ['tree_name', 'parent', 'is_active', 'effective_is_active']
+    list_select_related = ['parent', ]
+    ordering = ['path', ]
+
+    @admin.display(ordering='path', description=_('Name'))
+    def tree_name(self, category):
+        return f"{'— ' * (len(category.get_ancestor_ids()) - 1)}{category}"
 
 
 @admin.register(models.Brand)
@@ -0,0 +1,207 @@
+"""Read-only JSON catalog API.
+
+Clients pick fields with ?fields=a,b (all fields by default). Every response has an ETag (and Last-Modified when
+resource has datetime_modified) computed by a single small query, so a conditional request of an unchanged resource
+is answered with 304 before the resource is loaded or serialized.
+"""
+import hashlib
+from abc import ABCMeta, abstractmethod
+from operator import attrgetter
+
+from django.core.paginator import Paginator, InvalidPage
+from django.db.models import Max, Count, Q, Prefetch
+from django.http import JsonResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.utils.translation import get_language
+from django.views.generic import View
+
+from .cache import get_listing_version
+from .categories import get_category_tree
+from .forms import CategoryFilterForm, ListingSortForm
+from .models import Product, ProductVariant, ProductCategory
+from .queries import category_variants_list
+
+VARIANT_FIELDS = {
+    'id': attrgetter('id'),
+    'sku': attrgetter('sku'),
+    'url': lambda variant: variant.get_absolute_url(),
+    'name': attrgetter('product.name'),
+    'product_id': attrgetter('product_id'),
+    'category_id': attrgetter('product.category_id'),
+    'brand_id': attrgetter('brand_id'),
+    'color_id': attrgetter('color_id'),
+    'is_default': attrgetter('is_default'),
+    'image_url': attrgetter('thumbnail_image.url'),
+    'price_toman': attrgetter('price_toman'),
+    'price_dollar': attrgetter('price_dollar'),
+    'store_price_toman': attrgetter('store_price_toman'),
+    'store_price_dollar': attrgetter('store_price_dollar'),
+    'discount_percent': attrgetter('discount_percent'),
+    'in_stock': attrgetter('in_stock'),
+    'score': attrgetter('score'),
+    'datetime_modified': lambda variant: max(variant.datetime_modified, variant.product.datetime_modified),
+}
+
+PRODUCT_FIELDS = {
+    'id': attrgetter('id'),
+    'name': attrgetter('name'),
+    'description': attrgetter('description'),
+    'category_id': attrgetter('category_id'),
+    'score': attrgetter('score'),
+    'comments_count': attrgetter('comments_count'),
+    'rated_count': attrgetter('rated_count'),
+    'variants': lambda product: [
+        variant.sku
+        for variant in sorted(product.variants.all(), key=lambda variant: (not variant.is_default, variant.id))
+    ],
+    'datetime_modified': attrgetter('last_modified'),
+}
+
+CATEGORY_FIELDS = {
+    'id': attrgetter('id'),
+    'parent_id': attrgetter('parent_id'),
+    'name': attrgetter('name'),
+    'url': lambda node: node.get_absolute_url(),
+}
+
+
+def parse_fields(value, available):
+    """Return names of requested fields in given order, all of them when value is empty.
+       Raises ValueError listing unknown names.
+    """
+    if not value:
+        return list(available)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return fields
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+class CatalogApiView(View, metaclass=ABCMeta):
+    """Answers conditional GETs from get_state() alone, get_data() runs only when the resource has to be sent.
+       Subclasses implement both of them.
+    """
+    http_method_names = ['get', 'head', 'options']
+    available_fields = {}
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.fields = parse_fields(request.GET.get('fields', ''), self.available_fields)
+        except ValueError as error:
+            return JsonResponse({'error': f'Unknown fields: {error}'}, status=400)
+        last_modified, etag_parts = self.get_state()
+        etag = make_etag(get_language(), *self.fields, *etag_parts)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = JsonResponse(self.get_data())
+        if response.status_code in (200, 304):
+            response.headers.setdefault('ETag', etag)
+            if last_modified:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+    @abstractmethod
+    def get_state(self):
+        """Return (last modified datetime or None, ETag parts), raise Http404 for missing resources"""
+
+    @abstractmethod
+    def get_data(self):
+        """Return JSON data of the resource"""
+
+    def serialize(self, obj):
+        return {name: self.available_fields[name](obj) for name in self.fields}
+
+
+class ProductVariantApiView(CatalogApiView):
+    available_fields = VARIANT_FIELDS
+
+    def get_state(self):
+        state = (
+            ProductVariant.active_manager.filter(sku=self.kwargs['sku'])
+            .values_list('id', 'datetime_modified', 'product__datetime_modified').first()
+        )
+        if state is None:
+            raise Http404
+        variant_id, *modified = state
+        return max(modified), (variant_id, *modified)
+
+    def get_data(self):
+        variants = ProductVariant.active_manager.get_variants_list()
+        return self.serialize(get_object_or_404(variants, sku=self.kwargs['sku']))
+
+
+class ProductApiView(CatalogApiView):
+    """A product with skus of its active variants, default variant first"""
+    available_fields = PRODUCT_FIELDS
+
+    def get_queryset(self):
+        return Product.active_manager.filter(pk=self.kwargs['product_id']).annotate(
+            variants_modified=Max('variants__datetime_modified', filter=Q(variants__is_active=True)),
+            variants_count=Count('variants', filter=Q(variants__is_active=True)),
+        )
+
+    def get_state(self):
+        state = self.get_queryset().values_list('datetime_modified', 'variants_modified', 'variants_count').first()
+        if state is None:
+            raise Http404
+        self.last_modified = max(filter(None, state[:2]))
+        return self.last_modified, state
+
+    def get_data(self):
+        queryset = self.get_queryset()
+        if 'variants' in self.fields:
+            variants = ProductVariant.objects.filter(is_active=True).only('sku', 'is_default', 'product')
+            queryset = queryset.prefetch_related(Prefetch('variants', variants))
+        product = get_object_or_404(queryset)
+        product.last_modified = self.last_modified
+        return self.serialize(product)
+
+
+class CategoryVariantsApiView(CatalogApiView):
+    """Paginated variants of a category subtree, accepts filters and sort of category listing page"""
+    available_fields = VARIANT_FIELDS
+    paginate_by = 24
+
+    def get_state(self):
+        self.category = get_object_or_404(ProductCategory.active_manager, slug=self.kwargs['category_slug'])
+        # listing version is a conservative validator: it changes with any variant that could enter or leave the
+        # filtered results, so the subtree is not scanned
+        return None, (self.category.path, self.request.GET.urlencode(), get_listing_version())
+
+    def get_data(self):
+        price_field = 'price_toman' if get_language() == 'fa' else 'price_dollar'
+        variants = category_variants_list(
+            self.category, CategoryFilterForm(self.request.GET).get_filters(),
+            ListingSortForm(self.request.GET).get_sort(), price_field
+        )
+        paginator = Paginator(variants, self.paginate_by)
+        try:
+            page = paginator.page(self.request.GET.get('page', 1))
+        except InvalidPage:
+            raise Http404
+        return {
+            'count': paginator.count,
+            'page': page.number,
+            'num_pages': paginator.num_pages,
+            'results': [self.serialize(variant) for variant in page],
+        }
+
+
+class CategoryApiView(CatalogApiView):
+    """Active categories as a flat list in tree order, served from category tree of this process"""
+    available_fields = CATEGORY_FIELDS
+
+    def get_state(self):
+        nodes = get_category_tree().nodes.values()
+        return None, [(node.id, node.parent_id, node.names, node.slugs) for node in nodes]
+
+    def get_data(self):
+        return {'results': [self.serialize(node) for node in get_category_tree().nodes.values()]}
@@ -0,0 +1,99 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'products:catalog-version'
+LISTING_VERSION_KEY = 'products:listing-version'
+CSRF_TOKEN_PLACEHOLDER = '__csrf_token__'
+
+csrf_token_input_re = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def get_catalog_version():
+    """Version that is part of every cached page key, bumping it drops all cached pages at once."""
+    return cache.get_or_set(CATALOG_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # key is evicted, a fresh time based version can not collide with the old ones
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_catalog_version():
+    _bump_version(CATALOG_VERSION_KEY)
+    bump_listing_version()
+
+
+def get_listing_version():
+    """Version of variant listings, bumped whenever a variant page or every cached page is dropped. Validators of
+       listings are derived from it instead of scanning their variants.
+    """
+    return cache.get_or_set(LISTING_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_listing_version():
+    _bump_version(LISTING_VERSION_KEY)
+
+
+def _variant_page_key(catalog_version, sku, language):
+    return f'products:variant-page:{catalog_version}:{sku}:{language}'
+
+
+def get_variant_page(sku, language):
+    return cache.get(_variant_page_key(get_catalog_version(), sku, language))
+
+
+def set_variant_page(sku, language, content, timeout=None):
+    timeout = settings.CACHE_TTL if timeout is None else timeout
+    cache.set(_variant_page_key(get_catalog_version(), sku, language), content, timeout)
+
+
+def invalidate_variant_pages(skus):
+    """Drop cached detail pages of given skus in all languages, listings they are in change too"""
+    catalog_version = get_catalog_version()
+    cache.delete_many([
+        _variant_page_key(catalog_version, sku, language) for sku in skus for language, _ in settings.LANGUAGES
+    ])
+    bump_listing_version()
+
+
+def strip_csrf_token(content):
+    """Replace csrf token of rendered forms with a placeholder, so the page can be shared between visitors"""
+    return csrf_token_input_re.sub(rf'\g<1>{CSRF_TOKEN_PLACEHOLDER}\g<2>', content)
+
+
+def insert_csrf_token(content, csrf_token):
+    return content.replace(CSRF_TOKEN_PLACEHOLDER, csrf_token)
+
+
+def _variant_version_key(variant_id):
+    return f'products:variant-version:{variant_id}'
+
+
+def get_variant_version(variant_id):
+    """Version that is part of cached template fragment keys of a variant"""
+    return cache.get_or_set(_variant_version_key(variant_id), time.time_ns, timeout=None)
+
+
+def bump_variant_versions(variant_ids):
+    """Drop versions of given variants, next read sets a fresh one so old fragments are never hit again"""
+    cache.delete_many([_variant_version_key(variant_id) for variant_id in variant_ids])
+
+
+def invalidate_variants(variants):
+    """Drop cached pages and template fragments of given (id, sku) pairs once the transaction is committed,
+       so a request running in between can not cache the old data again.
+    """
+    variants = list(variants)
+
+    def invalidate():
+        invalidate_variant_pages([sku for _, sku in variants])
+        bump_variant_versions([variant_id for variant_id, _ in variants])
+
+    transaction.on_commit(invalidate)
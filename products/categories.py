@@ -0,0 +1,80 @@
+"""Process-local tree of active categories for menus and breadcrumbs, loaded with a single query."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import get_language
+
+from .models import ProductCategory
+
+_category_tree = None
+
+
+class CategoryNode:
+
+    def __init__(self, id_, parent_id, names, slugs):
+        self.id = id_
+        self.parent_id = parent_id
+        self.names = names
+        self.slugs = slugs
+        self.children = []
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def name(self):
+        return self.names.get(get_language()) or self.names[settings.LANGUAGE_CODE]
+
+    def get_absolute_url(self):
+        slug = self.slugs.get(get_language()) or self.slugs[settings.LANGUAGE_CODE]
+        return reverse('products:category-list', args=(slug,))
+
+
+class CategoryTree:
+
+    def __init__(self, categories, expires_at):
+        languages = [language for language, _ in settings.LANGUAGES]
+        self.nodes = {
+            category.id: CategoryNode(
+                category.id, category.parent_id,
+                {language: getattr(category, f'name_{language}') for language in languages},
+                {language: getattr(category, f'slug_{language}') for language in languages},
+            ) for category in categories
+        }
+        self.roots = []
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_id)
+            # children of inactive categories are not reachable from menus
+            if node.parent_id is None:
+                self.roots.append(node)
+            elif parent is not None:
+                parent.children.append(node)
+        self.expires_at = expires_at
+
+    def get_ancestors(self, category_id):
+        """Return nodes from root to given category (itself included), empty if it is not an active category"""
+        ancestors = []
+        node = self.nodes.get(category_id)
+        while node is not None:
+            ancestors.append(node)
+            node = self.nodes.get(node.parent_id)
+        return ancestors[::-1]
+
+
+def get_category_tree():
+    """Return category tree of this process, loading it again when it is older than CATEGORY_TREE_LOCAL_TTL"""
+    global _category_tree
+    now = timezone.now()
+    if _category_tree is None or _category_tree.expires_at <= now:
+        _category_tree = CategoryTree(
+            ProductCategory.active_manager.order_by('path'),
+            now + timedelta(seconds=settings.CATEGORY_TREE_LOCAL_TTL)
+        )
+    return _category_tree
+
+
+def clear_category_tree():
+    global _category_tree
+    _category_tree = None
@@ -0,0 +1,156 @@
+"""Inverted index from brand, color, attribute value and category ids to Redis bitmaps of active variant ids.
+
+Bit n of a bitmap is set when variant with id n is active and has that value, category bitmaps cover their whole
+subtree. Filters are answered with BITOP OR (values of one filter) and AND (different filters) inside Redis, then only
+the displayed page of ids is loaded from database. Which bitmaps a variant is in is stored in a hash, so a changed
+variant is moved out of its old bitmaps without knowing its previous values.
+"""
+import uuid
+
+from django_redis import get_redis_connection
+
+from . import models
+
+BITMAP_KEY = 'products:bitmap:{}:{}'
+MEMBERSHIPS_KEY = 'products:bitmap:memberships'
+# set once the bitmaps are fully built, until then filters fall back to database
+BUILT_KEY = 'products:bitmap:built'
+# results of filters, deleted right after reading
+TEMPORARY_KEY_PREFIX = 'products:bitmap-result:'
+
+BRAND = 'brand'
+COLOR = 'color'
+ATTRIBUTE_VALUE = 'attribute-value'
+CATEGORY = 'category'
+
+# KEYS are the memberships hash, the old bitmaps of the variant and its new ones. ARGV are variant id, number of old
+# bitmaps and the memberships they were read from, which must still be stored or nothing is changed and 0 returned.
+UPDATE_MEMBERSHIPS_SCRIPT = """
+local old = redis.call('HGET', KEYS[1], ARGV[1]) or ''
+if old ~= ARGV[3] then
+    return 0
+end
+local old_count = tonumber(ARGV[2])
+for i = 2, old_count + 1 do redis.call('SETBIT', KEYS[i], ARGV[1], 0) end
+if #KEYS > old_count + 1 then
+    for i = old_count + 2, #KEYS do redis.call('SETBIT', KEYS[i], ARGV[1], 1) end
+    redis.call('HSET', KEYS[1], ARGV[1], table.concat(KEYS, ' ', old_count + 2))
+else
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+def bitmap_key(kind, id_):
+    return BITMAP_KEY.format(kind, id_)
+
+
+def encode(ids):
+    """Return bitmap of given ids in Redis bit order, bit 0 is the most significant bit of the first byte"""
+    bitmap = bytearray(max(ids, default=-1) // 8 + 1)
+    for id_ in ids:
+        bitmap[id_ >> 3] |= 0x80 >> (id_ & 7)
+    return bytes(bitmap)
+
+
+def decode(bitmap):
+    """Return ids of set bits in descending order, so newest variants come first"""
+    ids = []
+    for byte_index in range(len(bitmap) - 1, -1, -1):
+        byte = bitmap[byte_index]
+        if byte:
+            ids.extend(byte_index * 8 + bit for bit in range(7, -1, -1) if byte & (0x80 >> bit))
+    return ids
+
+
+def _get_memberships(variant_ids=None):
+    """Return {variant id: bitmap keys} of given active variants (all if not given)"""
+    variants = models.ProductVariant.active_manager.all()
+    if variant_ids is not None:
+        variants = variants.filter(id__in=variant_ids)
+    memberships = {
+        variant_id: [
+            bitmap_key(BRAND, brand_id), bitmap_key(COLOR, color_id),
+            *(bitmap_key(CATEGORY, category_id) for category_id in models.path_ids(path))
+        ]
+        for variant_id, brand_id, color_id, path in variants.values_list(
+            'id', 'brand_id', 'color_id', 'product__category__path'
+        ).iterator(chunk_size=2000)
+    }
+    attribute_values = models.ProductAttributeValues.objects.filter(product_variant_id__in=variants.values('id'))
+    for variant_id, attribute_value_id in attribute_values.values_list(
+        'product_variant_id', 'attribute_value_id'
+    ).iterator(chunk_size=2000):
+        memberships[variant_id].append(bitmap_key(ATTRIBUTE_VALUE, attribute_value_id))
+    return memberships
+
+
+def update_variants(variant_ids):
+    """Move given variants to bitmaps of their current values, inactive or deleted variants are removed from all.
+       Every bitmap the script touches is passed as a key, so old bitmaps are read first and variants changed
+       concurrently in between are tried again.
+    """
+    variant_ids = list(dict.fromkeys(variant_ids))
+    memberships = _get_memberships(variant_ids)
+    connection = get_redis_connection()
+    update_memberships = connection.register_script(UPDATE_MEMBERSHIPS_SCRIPT)
+    while variant_ids:
+        old_memberships = [old.decode() if old else '' for old in connection.hmget(MEMBERSHIPS_KEY, variant_ids)]
+        with connection.pipeline(transaction=False) as pipe:
+            for variant_id, old in zip(variant_ids, old_memberships):
+                old_keys = old.split()
+                update_memberships(
+                    keys=[MEMBERSHIPS_KEY, *old_keys, *memberships.get(variant_id, [])],
+                    args=[variant_id, len(old_keys), old], client=pipe
+                )
+            updated = pipe.execute()
+        variant_ids = [variant_id for variant_id, done in zip(variant_ids, updated) if not done]
+
+
+def rebuild():
+    """Replace all bitmaps with ones built from database in a single transaction"""
+    memberships = _get_memberships()
+    bitmaps = {}
+    for variant_id, keys in memberships.items():
+        for key in keys:
+            bitmaps.setdefault(key, []).append(variant_id)
+    connection = get_redis_connection()
+    old_keys = list(connection.scan_iter(match=BITMAP_KEY.format('*', '*'), count=1000))
+    with connection.pipeline() as pipe:
+        if old_keys:
+            pipe.delete(*old_keys)
+        pipe.delete(MEMBERSHIPS_KEY)
+        for key, ids in bitmaps.items():
+            pipe.set(key, encode(ids))
+        serialized = [(variant_id, ' '.join(keys)) for variant_id, keys in memberships.items()]
+        for start in range(0, len(serialized), 1000):
+            pipe.hset(MEMBERSHIPS_KEY, mapping=dict(serialized[start:start + 1000]))
+        pipe.set(BUILT_KEY, 1)
+        pipe.execute()
+    return len(memberships), len(bitmaps)
+
+
+def filter_variant_ids(category_id, groups):
+    """Return ids of active variants in subtree of category which have at least one value of every group, groups are
+       lists of (kind, id) pairs. Returns None when bitmaps are not built yet.
+    """
+    connection = get_redis_connection()
+    if not connection.exists(BUILT_KEY):
+        return None
+    temporary_keys = []
+    and_keys = [bitmap_key(CATEGORY, category_id)]
+    for group in groups:
+        if not group:
+            return []
+        temporary_keys.append(f'{TEMPORARY_KEY_PREFIX}{uuid.uuid4().hex}')
+        and_keys.append(temporary_keys[-1])
+    result_key = f'{TEMPORARY_KEY_PREFIX}{uuid.uuid4().hex}'
+    with connection.pipeline(transaction=False) as pipe:
+        for temporary_key, group in zip(temporary_keys, groups):
+            pipe.bitop('OR', temporary_key, *(bitmap_key(kind, id_) for kind, id_ in group))
+        pipe.bitop('AND', result_key, *and_keys)
+        pipe.get(result_key)
+        pipe.delete(result_key, *temporary_keys)
+        bitmap = pipe.execute()[-2]
+    return decode(bitmap or b'')
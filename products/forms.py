@@ -1,5 +1,5 @@
 from django import forms
-from django.utils.translation import gettext as _
+from django.utils.translation import gettext as _, gettext_lazy
 
 from tinymce.widgets import TinyMCE
 
@@ -58,3 +58,49 @@ class ProductVariantAdminForm(forms.ModelForm):
             'store_price_toman': forms.NumberInput(attrs={'width': '300px'}),
         }
 
+
+class IdsField(forms.MultipleChoiceField):
+    """Multiple choice field of ids that are not checked against database, unknown ids just filter out everything"""
+
+    def to_python(self, value):
+        try:
+            return [int(id_) for id_ in super().to_python(value)]
+        except ValueError:
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+
+    def valid_value(self, value):
+        return value > 0
+
+
+class ListingSortForm(forms.Form):
+    SORT_NEWEST = 'newest'
+    SORT_CHEAPEST = 'cheapest'
+    SORT_MOST_EXPENSIVE = 'most-expensive'
+    SORT_TOP_RATED = 'top-rated'
+    SORT_BEST_SELLING = 'best-selling'
+
+    SORT_CHOICES = [
+        (SORT_NEWEST, gettext_lazy('Newest')),
+        (SORT_CHEAPEST, gettext_lazy('Cheapest')),
+        (SORT_MOST_EXPENSIVE, gettext_lazy('Most expensive')),
+        (SORT_TOP_RATED, gettext_lazy('Top rated')),
+        (SORT_BEST_SELLING, gettext_lazy('Best selling')),
+    ]
+    sort = forms.ChoiceField(choices=SORT_CHOICES, required=False)
+
+    def get_sort(self):
+        """Return selected sort, invalid or missing sort falls back to newest"""
+        return self.cleaned_data.get('sort') if self.is_valid() and self.cleaned_data.get('sort') else self.SORT_NEWEST
+
+
+class CategoryFilterForm(forms.Form):
+    brand = IdsField(required=False)
+    color = IdsField(required=False)
+    attribute_value = IdsField(required=False)
+    min_price = forms.DecimalField(min_value=0, required=False)
+    max_price = forms.DecimalField(min_value=0, required=False)
+
+    def get_filters(self):
+        """Return cleaned filters that have a value, invalid filters are ignored instead of showing an error"""
+        self.is_valid()
+        return {name: value for name, value in self.cleaned_data.items() if value not in (None, [])}
@@ -0,0 +1,90 @@
+"""Merchandising sections of home page, built by a job into cache as plain product card data per language.
+
+Home page only reads the cache, so it runs no catalog query however many visitors it has. Sections never expire, the
+last built ones are served until build_home_sections command replaces them. Run it with --stale every minute: it
+builds sections once they are older than HOME_SECTIONS_TTL or promotions are changed. Applied promotion boundaries
+build them right away, in the promotion scheduler.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.translation import gettext_lazy as _
+
+from .models import ProductVariant
+from .thumbnails import resolve_thumbnails
+
+HOME_SECTIONS_KEY = 'products:home-sections:{}'
+# time of the last build, deleted when sections are stale
+HOME_SECTIONS_BUILT_KEY = 'products:home-sections-built'
+SECTION_SIZE = 12
+
+SECTION_TITLES = {
+    'deals': _('Amazing offers'),
+    'bestsellers': _('Best sellers'),
+    'new-arrivals': _('New arrivals'),
+    'top-rated': _('Top rated'),
+}
+
+
+def _get_section_variants():
+    """Return {section: default variants} in display order, a product shows up once in each section"""
+    variants = ProductVariant.active_manager.get_variants_list().filter(is_default=True)
+    return {
+        'deals': variants.filter(discount_percent__gt=0).order_by('-discount_percent', '-id'),
+        'bestsellers': variants.filter(units_sold__gt=0).order_by('-units_sold', '-id'),
+        'new-arrivals': variants.order_by('-id'),
+        'top-rated': variants.filter(score__gt=0).order_by('-score', '-id'),
+    }
+
+
+def _get_card(product_variant, image_url):
+    """Card data of a variant in active language"""
+    toman = translation.get_language() == 'fa'
+    return {
+        'name': product_variant.product.name,
+        'url': product_variant.get_absolute_url(),
+        'image_url': image_url,
+        'price': product_variant.price_toman if toman else product_variant.price_dollar,
+        'store_price': product_variant.store_price_toman if toman else product_variant.store_price_dollar,
+        'discount_percent': product_variant.discount_percent,
+        'in_stock': product_variant.in_stock,
+    }
+
+
+def build_home_sections():
+    """Query sections once and store their cards in every language, returns {section: cards count}"""
+    sections = {key: list(variants[:SECTION_SIZE]) for key, variants in _get_section_variants().items()}
+    # a variant can be in several sections, thumbnails of all of them are resolved with one kvstore lookup
+    variants = list({variant.id: variant for section in sections.values() for variant in section}.values())
+    # originals stand in for thumbnails not generated yet, until sections are built again
+    thumbnails = resolve_thumbnails([variant.thumbnail_image for variant in variants], 'large')
+    image_urls = {variant.id: thumbnail.url for variant, thumbnail in zip(variants, thumbnails)}
+    for language, _name in settings.LANGUAGES:
+        with translation.override(language):
+            cache.set(
+                HOME_SECTIONS_KEY.format(language),
+                [
+                    (key, [_get_card(variant, image_urls[variant.id]) for variant in product_variants])
+                    for key, product_variants in sections.items()
+                ],
+                timeout=None
+            )
+    cache.set(HOME_SECTIONS_BUILT_KEY, time.time(), timeout=None)
+    return {key: len(product_variants) for key, product_variants in sections.items()}
+
+
+def mark_home_sections_stale():
+    cache.delete(HOME_SECTIONS_BUILT_KEY)
+
+
+def home_sections_stale():
+    built_at = cache.get(HOME_SECTIONS_BUILT_KEY)
+    return built_at is None or time.time() - built_at > settings.HOME_SECTIONS_TTL
+
+
+def get_home_sections(language):
+    """Return [(title, cards)] of non empty sections from cache, nothing until they are built once"""
+    sections = cache.get(HOME_SECTIONS_KEY.format(language), [])
+    return [(SECTION_TITLES[key], cards) for key, cards in sections if cards]
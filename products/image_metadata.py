@@ -0,0 +1,61 @@
+"""Dimensions, dominant color and a tiny blurred placeholder of product images, computed once when an image is saved.
+
+Templates reserve space with the dimensions and paint the placeholder until the image arrives, without opening any
+image while rendering. Django's width_field/height_field are not used, they open the image on every model load when
+the fields are empty.
+"""
+import base64
+import io
+import logging
+
+from PIL import Image, ImageFilter, ImageOps, ExifTags
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SIZE = 16
+# EXIF orientations that rotate the image by 90 degrees, thumbnails are generated rotated
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def get_image_metadata(file_):
+    """Return (width, height, dominant color, placeholder data uri) of an image as it is displayed"""
+    with Image.open(file_) as image:
+        width, height = image.size
+        if image.getexif().get(ExifTags.Base.Orientation) in ROTATED_ORIENTATIONS:
+            width, height = height, width
+        # JPEG images are decoded at a fraction of their size
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        small = ImageOps.exif_transpose(image).convert('RGB')
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    quantized = small.quantize(colors=8)
+    _count, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    placeholder = io.BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(placeholder, 'WEBP', quality=40)
+    return (
+        width, height, f'#{red:02x}{green:02x}{blue:02x}',
+        'data:image/webp;base64,' + base64.b64encode(placeholder.getvalue()).decode()
+    )
+
+
+def update_image_metadata(instance, field_name, metadata_fields):
+    """Fill metadata_fields (width, height, color and placeholder field names) of an image field of instance when a new
+       file is uploaded or they are empty. They are cleared when image can't be read.
+    """
+    field_file = getattr(instance, field_name)
+    if field_file and field_file._committed and getattr(instance, metadata_fields[0]) is not None:
+        return
+    metadata = (None, None, '', '')
+    if field_file:
+        try:
+            metadata = get_image_metadata(field_file)
+        except (OSError, ValueError):
+            logger.warning('Reading metadata of image %s failed', field_file.name, exc_info=True)
+        finally:
+            # a new upload is read again when it's stored, a stored file is closed
+            if field_file._committed:
+                field_file.close()
+            else:
+                field_file.seek(0)
+    for field, value in zip(metadata_fields, metadata):
+        setattr(instance, field, value)
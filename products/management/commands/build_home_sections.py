@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from products.home_sections import build_home_sections, home_sections_stale
+
+
+class Command(BaseCommand):
+    help = 'Build cached home page sections (deals, best sellers, new arrivals and top rated products). ' \
+           'With --stale they are built only when older than HOME_SECTIONS_TTL or promotions are changed, ' \
+           'run it every minute.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true', help='Build sections only when they are stale.')
+
+    def handle(self, *args, **options):
+        if options['stale'] and not home_sections_stale():
+            self.stdout.write('Home sections are up to date.')
+            return
+        sections = build_home_sections()
+        self.stdout.write(self.style.SUCCESS(
+            'Home sections built: ' + ', '.join(f'{key} ({count})' for key, count in sections.items())
+        ))
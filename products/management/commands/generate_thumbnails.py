@@ -0,0 +1,24 @@
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+
+from products.models import ProductVariant, ProductImage
+from products.thumbnails import get_executor, generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate missing sizes of PRODUCT_IMAGE_SIZES for all variant thumbnails and product images, ' \
+           'run it after adding a size or for images uploaded before thumbnails were pre-generated.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Images sent to a worker at once')
+
+    def handle(self, *args, **options):
+        names = list(chain(
+            ProductVariant.objects.exclude(thumbnail_image='').values_list('thumbnail_image', flat=True).distinct(),
+            ProductImage.objects.exclude(image='').values_list('image', flat=True).distinct(),
+        ))
+        batch_size = options['batch_size']
+        batches = [names[start:start + batch_size] for start in range(0, len(names), batch_size)]
+        generated = sum(get_executor().map(generate_thumbnails, batches))
+        self.stdout.write(self.style.SUCCESS(f'Thumbnails of {generated} images generated.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from products.models import ProductCategory, CategoryFacet
+
+
+class Command(BaseCommand):
+    help = 'Count product variants of every category per brand, color and attribute value again, ' \
+           'use it to fill facets of existing categories or recover them after bulk changes. ' \
+           'With --stale only categories changed since the last run are counted, run it every minute.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', action='store_true', help='Rebuild only facets of categories marked stale by changes.'
+        )
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            count = CategoryFacet.objects.rebuild_stale()
+        else:
+            category_ids = list(ProductCategory.objects.values_list('id', flat=True))
+            for category_id in category_ids:
+                CategoryFacet.objects.rebuild(category_id)
+            count = len(category_ids)
+        self.stdout.write(self.style.SUCCESS(f'Facets of {count} categories rebuilt.'))
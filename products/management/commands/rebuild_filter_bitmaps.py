@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from products import filter_bitmaps
+
+
+class Command(BaseCommand):
+    help = 'Build Redis bitmaps of active variants per brand, color, attribute value and category from database, ' \
+           'category filters use database until it is run once.'
+
+    def handle(self, *args, **options):
+        variants_count, bitmaps_count = filter_bitmaps.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{bitmaps_count} bitmaps of {variants_count} variants built.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from products.promotions import apply_promotion_boundaries
+
+
+class Command(BaseCommand):
+    help = 'Store discount of currently active promotions and final prices on all product variants, ' \
+           'use it to recover prices when run_promotion_scheduler was not running.'
+
+    def handle(self, *args, **options):
+        changed_ids = apply_promotion_boundaries()
+        self.stdout.write(self.style.SUCCESS(f'Prices of {len(changed_ids)} product variants updated.'))
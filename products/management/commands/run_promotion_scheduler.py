@@ -0,0 +1,58 @@
+import sched
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from products.models import ProductPromotion
+from products.promotions import apply_promotion_boundaries
+
+# promotions are active strictly after their start, so boundaries are applied a moment later
+BOUNDARY_DELAY = 0.01
+
+
+class Command(BaseCommand):
+    help = 'Long running worker that applies promotions exactly when they start or end. Boundaries of the next ' \
+           'reload interval are kept in an in-process scheduler, so promotions edited meanwhile are picked up on reload.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reload-interval', type=int, default=60, help='Seconds between loading upcoming promotion boundaries.'
+        )
+
+    def handle(self, *args, **options):
+        self.reload_interval = timedelta(seconds=options['reload_interval'])
+        self.scheduler = sched.scheduler(time.time, time.sleep)
+        self.scheduled_boundaries = set()
+        # prices may have been changed while worker was not running
+        self.applied_until = timezone.now()
+        self.report(apply_promotion_boundaries())
+        self.reload()
+        try:
+            self.scheduler.run()
+        except KeyboardInterrupt:
+            pass
+
+    def reload(self):
+        close_old_connections()
+        horizon = timezone.now() + self.reload_interval
+        for boundary in ProductPromotion.objects.get_boundaries(self.applied_until, horizon):
+            if boundary not in self.scheduled_boundaries:
+                self.scheduled_boundaries.add(boundary)
+                self.scheduler.enterabs(boundary.timestamp() + BOUNDARY_DELAY, 0, self.apply, (boundary,))
+        self.scheduler.enterabs(horizon.timestamp(), 1, self.reload)
+
+    def apply(self, boundary):
+        close_old_connections()
+        self.scheduled_boundaries.discard(boundary)
+        now = timezone.now()
+        variant_ids = ProductPromotion.objects.get_boundary_variant_ids(self.applied_until, now)
+        self.applied_until = now
+        if variant_ids:
+            self.report(apply_promotion_boundaries(variant_ids), boundary)
+
+    def report(self, changed_ids, boundary=None):
+        at = f' at {boundary:%Y-%m-%d %H:%M:%S}' if boundary else ''
+        self.stdout.write(f'Prices of {len(changed_ids)} product variants updated{at}.')
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.suggestions import SuggestionIndex
+
+
+class Command(BaseCommand):
+    help = 'Build search suggestions index the same way web processes do and report its size, ' \
+           'use it to tune SUGGESTION_INDEX_MAX_ENTRIES.'
+
+    def handle(self, *args, **options):
+        stats = SuggestionIndex(settings.SUGGESTION_INDEX_MAX_ENTRIES).build().get_stats()
+        self.stdout.write(
+            f"{stats['entries']} of max {stats['max_entries']} entries with {stats['keys']} keys, "
+            f"about {stats['memory_bytes'] / 1024 / 1024:.1f} MiB."
+        )
+        if stats['entries'] >= stats['max_entries']:
+            self.stdout.write(self.style.WARNING('Index is full, some products are not suggested.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from products.models import ProductVariant, ProductImage
+from products.image_metadata import update_image_metadata
+
+
+class Command(BaseCommand):
+    help = 'Compute dimensions, dominant color and placeholder of variant thumbnails and product images that ' \
+           'have none yet, e.g. images uploaded before they were computed on save.'
+
+    def handle(self, *args, **options):
+        updated = 0
+        for model, field_name, metadata_fields in (
+            (ProductVariant, 'thumbnail_image', ProductVariant.THUMBNAIL_METADATA_FIELDS),
+            (ProductImage, 'image', ProductImage.METADATA_FIELDS),
+        ):
+            instances = model.objects.filter(**{f'{metadata_fields[0]}__isnull': True}).exclude(**{field_name: ''})
+            for instance in instances.only(field_name, metadata_fields[0]).iterator(chunk_size=500):
+                update_image_metadata(instance, field_name, metadata_fields)
+                if getattr(instance, metadata_fields[0]) is not None:
+                    # update() so saving does not send signals or touch other fields
+                    model.objects.filter(pk=instance.pk).update(
+                        **{field: getattr(instance, field) for field in metadata_fields}
+                    )
+                    updated += 1
+        self.stdout.write(self.style.SUCCESS(f'Metadata of {updated} images updated.'))
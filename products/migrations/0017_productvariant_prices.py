@@ -0,0 +1,108 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:35
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+
+def fill_prices(apps, schema_editor):
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    ProductPromotion = apps.get_model('products', 'ProductPromotion')
+    now = timezone.now()
+    discount_percent = Coalesce(
+        Subquery(
+            ProductPromotion.objects.filter(
+                product_variants__id=OuterRef('id'), datetime_start__lt=now, datetime_end__gt=now, active=True
+            ).values_list('discount_percent', flat=True)[:1]
+        ),
+        Value(0)
+    )
+    ProductVariant.objects.update(
+        discount_percent=discount_percent,
+        price_toman=F('store_price_toman') * (100 - discount_percent) / 100,
+        price_dollar=Round(F('store_price_dollar') * (100 - discount_percent) / 100, 2),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_alter_productpromotion_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='brand',
+            options={'verbose_name': 'Brand', 'verbose_name_plural': 'Brands'},
+        ),
+        migrations.AlterModelOptions(
+            name='color',
+            options={'verbose_name': 'Color', 'verbose_name_plural': 'Colors'},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'verbose_name': 'Product', 'verbose_name_plural': 'Products'},
+        ),
+        migrations.AlterModelOptions(
+            name='productattribute',
+            options={'verbose_name': 'Product Attribute', 'verbose_name_plural': 'Product Attributes'},
+        ),
+        migrations.AlterModelOptions(
+            name='productattributevalue',
+            options={'verbose_name': 'Product Attribute-Value', 'verbose_name_plural': 'Product Attributes-Values'},
+        ),
+        migrations.AlterModelOptions(
+            name='productattributevalues',
+            options={'verbose_name': 'Product-Attribute-Value', 'verbose_name_plural': 'Products-Attributes-Values'},
+        ),
+        migrations.AlterModelOptions(
+            name='productimage',
+            options={'verbose_name': 'Product image', 'verbose_name_plural': 'Product images'},
+        ),
+        migrations.AlterModelOptions(
+            name='productpromotion',
+            options={'default_manager_name': 'objects', 'verbose_name': 'Promotion', 'verbose_name_plural': 'Promotions'},
+        ),
+        migrations.AlterModelOptions(
+            name='producttype',
+            options={'verbose_name': 'Product type', 'verbose_name_plural': 'Product types'},
+        ),
+        migrations.AlterModelOptions(
+            name='producttypeattribute',
+            options={'verbose_name': 'Product type - Attribute', 'verbose_name_plural': 'Product types - Attributes'},
+        ),
+        migrations.AlterModelOptions(
+            name='productvariant',
+            options={'verbose_name': 'Product Variant', 'verbose_name_plural': 'Product Variants'},
+        ),
+        migrations.AlterModelOptions(
+            name='stock',
+            options={'verbose_name': 'Product variant stock', 'verbose_name_plural': 'Product variants stock'},
+        ),
+        migrations.AlterModelManagers(
+            name='productpromotion',
+            managers=[
+            ],
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='discount_percent',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Discount percent'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='price_dollar',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=7, verbose_name='Price dollar'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='price_toman',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Price toman'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(condition=models.Q(('discount_percent__gt', 0)), fields=['discount_percent'], name='discounted_variants_idx'),
+        ),
+        migrations.RunPython(fill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductComment = apps.get_model('comments', 'ProductComment')
+    Product.objects.update(
+        comments_count=Coalesce(
+            Subquery(
+                ProductComment.objects.filter(product=OuterRef('pk'), is_verified=True, parent__isnull=True)
+                .values('product').annotate(count=Count('id')).values('count')
+            ),
+            Value(0)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_productvariant_prices'),
+        ('comments', '0003_productcomment_score_applied'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Comments count'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
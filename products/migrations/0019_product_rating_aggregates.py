@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductComment = apps.get_model('comments', 'ProductComment')
+    rated_comments = ProductComment.objects.filter(product=OuterRef('pk'), is_verified=True, score_applied=True) \
+        .values('product')
+    Product.objects.update(
+        score_sum=Coalesce(Subquery(rated_comments.annotate(total=Sum('score')).values('total')), Value(0)),
+        rated_count=Coalesce(Subquery(rated_comments.annotate(count=Count('id')).values('count')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_product_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rated_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Rated comments count'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Score sum'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.PositiveSmallIntegerField(choices=[(1, 'Brand'), (2, 'Color'), (3, 'Attribute value')], verbose_name='Facet')),
+                ('value_id', models.PositiveIntegerField(verbose_name='Value id')),
+                ('count', models.PositiveIntegerField(verbose_name='Product variants count')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='products.productcategory', verbose_name='Category')),
+            ],
+            options={
+                'verbose_name': 'Category facet',
+                'verbose_name_plural': 'Category facets',
+                'unique_together': {('category', 'facet', 'value_id')},
+            },
+        ),
+    ]
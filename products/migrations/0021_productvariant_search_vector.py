@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_search_vectors(apps, schema_editor):
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    ProductAttributeValues = apps.get_model('products', 'ProductAttributeValues')
+
+    def attribute_values_text(language):
+        return Subquery(
+            ProductAttributeValues.objects.filter(product_variant=OuterRef('pk')).values('product_variant')
+            .annotate(text=StringAgg(f'attribute_value__attribute_value_{language}', ' ')).values('text')
+        )
+
+    vector = (
+        SearchVector('product__name_fa', config='simple', weight='A')
+        + SearchVector('product__name_en', config='english', weight='A')
+        + SearchVector('brand__name_fa', 'brand__name_en', config='simple', weight='B')
+        + SearchVector('color__name_fa', 'color__name_en', config='simple', weight='B')
+        + SearchVector(attribute_values_text('fa'), config='simple', weight='C')
+        + SearchVector(attribute_values_text('en'), config='english', weight='C')
+        + SearchVector('product__description_fa', config='simple', weight='D')
+        + SearchVector('product__description_en', config='english', weight='D')
+    )
+    ProductVariant.objects.update(search_vector=Subquery(
+        ProductVariant.objects.filter(pk=OuterRef('pk')).annotate(vector=vector).values('vector')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_categoryfacet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='variant_search_vector_idx'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
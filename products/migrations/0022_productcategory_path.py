@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    ProductCategory = apps.get_model('products', 'ProductCategory')
+    categories = list(ProductCategory.objects.all())
+    parents = {category.id: category.parent_id for category in categories}
+
+    def get_path(category_id):
+        parent_id = parents[category_id]
+        return f'{get_path(parent_id) if parent_id else "/"}{category_id}/'
+
+    for category in categories:
+        category.path = get_path(category.id)
+    ProductCategory.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_productvariant_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcategory',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Path'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productcategory',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+def fill_effective_is_active(apps, schema_editor):
+    ProductCategory = apps.get_model('products', 'ProductCategory')
+    categories = list(ProductCategory.objects.all())
+    is_active = {category.id: category.is_active for category in categories}
+    for category in categories:
+        category.effective_is_active = all(is_active[int(id_)] for id_ in category.path.strip('/').split('/') if id_)
+    ProductCategory.objects.bulk_update(categories, ['effective_is_active'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_productcategory_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcategory',
+            name='effective_is_active',
+            field=models.BooleanField(db_index=True, default=True, editable=False, verbose_name='Effectively active'),
+        ),
+        migrations.RunPython(fill_effective_is_active, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:51
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_sort_keys(apps, schema_editor):
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    Product = apps.get_model('products', 'Product')
+    Stock = apps.get_model('products', 'Stock')
+    ProductVariant.objects.update(
+        score=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('score')),
+        units_sold=Coalesce(
+            Subquery(Stock.objects.filter(product_variant=OuterRef('pk')).values('units_sold')), Value(0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_productcategory_effective_is_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Score'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Units Sold'),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productvariant',
+            name='price_dollar',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=7, verbose_name='Price dollar'),
+        ),
+        migrations.AlterField(
+            model_name='productvariant',
+            name='price_toman',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Price toman'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['price_toman', 'id'], name='variant_price_toman_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['price_dollar', 'id'], name='variant_price_dollar_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['-score', '-id'], name='variant_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['-units_sold', '-id'], name='variant_units_sold_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:00
+
+from django.db import migrations, models
+import products.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_productvariant_sort_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(db_index=True, storage=products.storage.ContentHashStorage(), upload_to='products/', verbose_name='Image'),
+        ),
+        migrations.AlterField(
+            model_name='productvariant',
+            name='thumbnail_image',
+            field=models.ImageField(db_index=True, storage=products.storage.ContentHashStorage(), upload_to='products/', verbose_name='Thumbnail image'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_content_hash_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Dominant color'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Height'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Placeholder'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Width'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='thumbnail_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Thumbnail dominant color'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Thumbnail height'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='thumbnail_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Thumbnail placeholder'),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Thumbnail width'),
+        ),
+    ]
@@ -1,43 +1,85 @@
 import random
+from collections import defaultdict
 from decimal import Decimal
 
 from django.db import models
-from django.db.models.functions import Coalesce
-from django.db.models import Case, When, Value, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Round, Cast, NullIf, Concat, Substr
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models import Case, When, Value, OuterRef, Subquery, F, Q, Min, Count
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _, gettext
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db import transaction
+from django.dispatch import Signal
+from django.utils.functional import cached_property
 
 from colorfield.fields import ColorField
+from django_redis import get_redis_connection
 
 from config.utils.i18n.datetime import translate_datetime, format_timedelta
+from . import related_pools
+from .storage import product_image_storage
+from .image_metadata import update_image_metadata
+
+
+def current_discount_percent():
+    """Expression of the discount percent of active promotion of a variant, 0 if there is none"""
+    return Coalesce(
+        Subquery(
+            ProductPromotion.active_manager.filter(product_variants__id=OuterRef('id'))
+            .values_list('discount_percent', flat=True)[:1]
+        ),
+        Value(0)
+    )
+
+
+def _attribute_values_text(language):
+    return Subquery(
+        ProductAttributeValues.objects.filter(product_variant=OuterRef('pk')).values('product_variant')
+        .annotate(text=StringAgg(f'attribute_value__attribute_value_{language}', ' ')).values('text')
+    )
+
+
+def variant_search_vector():
+    """Expression of weighted search document of a variant. Postgres has no Persian configuration, so Persian texts
+       use simple one (no stemming) and English texts use english one.
+    """
+    return (
+        SearchVector('product__name_fa', config='simple', weight='A')
+        + SearchVector('product__name_en', config='english', weight='A')
+        + SearchVector('brand__name_fa', 'brand__name_en', config='simple', weight='B')
+        + SearchVector('color__name_fa', 'color__name_en', config='simple', weight='B')
+        + SearchVector(_attribute_values_text('fa'), config='simple', weight='C')
+        + SearchVector(_attribute_values_text('en'), config='english', weight='C')
+        + SearchVector('product__description_fa', config='simple', weight='D')
+        + SearchVector('product__description_en', config='english', weight='D')
+    )
 
 
 class ActiveCategoryManager(models.Manager):
     def get_queryset(self):
-        return super().get_queryset().filter(is_active=True)
+        return super().get_queryset().filter(effective_is_active=True)
 
 
 class ActiveProductManager(models.Manager):
 
     def get_queryset(self):
-        return super().get_queryset().filter(category__is_active=True, is_active=True)
+        return super().get_queryset().filter(category__effective_is_active=True, is_active=True)
 
 
 class ActiveProductVariantManager(models.Manager):
 
     def get_queryset(self):
-        return super().get_queryset().filter(product__category__is_active=True, product__is_active=True, is_active=True)
-
-    def get_variants_list(self):
-        """Return a query set of product variants with product title and price info annotated."""
-        discount_percent_subquery = (
-            ProductPromotion.active_manager.filter(product_variants__id=OuterRef('id'))
-            .values_list('discount_percent', flat=True)[:1]
+        return super().get_queryset().filter(
+            product__category__effective_is_active=True, product__is_active=True, is_active=True
         )
 
+    def get_variants_list(self):
+        """Return a query set of product variants with product title and stock info, prices are stored on variants."""
         return (
             self.select_related('product', 'product__category', 'stock')
             .annotate(
@@ -46,10 +88,108 @@ class ActiveProductVariantManager(models.Manager):
                     default=Value(False),
                     output_field=models.BooleanField()
                 ),
-                discount_percent=Coalesce(Subquery(discount_percent_subquery), Value(0))
             )
         )
 
+    def get_related_pool_members(self, category_id):
+        """Return (product_id, variant_id) pairs of default variants in a category for filling its related pool"""
+        return list(self.filter(product__category_id=category_id, is_default=True).values_list('product_id', 'id'))
+
+
+class ProductManager(models.Manager):
+
+    def update_counters(self, product_id, comments_count=0, score_sum=0, rated_count=0):
+        """Add given deltas to counters of a product and recalculate its score in a single UPDATE, concurrent updates
+           are never lost since the new values are calculated by database.
+        """
+        updates = {}
+        if comments_count:
+            updates['comments_count'] = F('comments_count') + comments_count
+        if score_sum or rated_count:
+            new_score_sum = F('score_sum') + score_sum
+            new_rated_count = F('rated_count') + rated_count
+            updates.update(
+                score_sum=new_score_sum,
+                rated_count=new_rated_count,
+                score=Coalesce(
+                    Round(
+                        Cast(new_score_sum, models.DecimalField(max_digits=12, decimal_places=4))
+                        / NullIf(new_rated_count, 0), 1
+                    ),
+                    Value(0),
+                    output_field=models.FloatField()
+                )
+            )
+        if updates:
+            self.filter(pk=product_id).update(datetime_modified=timezone.now(), **updates)
+            if 'score' in updates:
+                ProductVariant.objects.filter(product_id=product_id).update(
+                    datetime_modified=timezone.now(), score=Subquery(self.filter(pk=product_id).values('score'))
+                )
+
+
+class ProductVariantManager(models.Manager):
+
+    def refresh_prices(self, variant_ids=None):
+        """Store discount percent of active promotion and final prices on given variants (all if not given) whose
+           discount is changed, returns ids of updated variants.
+        """
+        variants = self.all() if variant_ids is None else self.filter(id__in=variant_ids)
+        changed_ids = list(
+            variants.annotate(current_discount_percent=current_discount_percent())
+            .exclude(discount_percent=F('current_discount_percent')).values_list('id', flat=True)
+        )
+        if changed_ids:
+            discount_percent = current_discount_percent()
+            self.filter(id__in=changed_ids).update(
+                datetime_modified=timezone.now(),
+                discount_percent=discount_percent,
+                price_toman=F('store_price_toman') * (100 - discount_percent) / 100,
+                price_dollar=Round(F('store_price_dollar') * (100 - discount_percent) / 100, 2),
+            )
+        return changed_ids
+
+    def update_search_vectors(self, variant_ids=None):
+        """Store search document of given variants (all if not given), UPDATE can not join so it is a subquery"""
+        variants = self.all() if variant_ids is None else self.filter(id__in=variant_ids)
+        return variants.update(search_vector=Subquery(
+            self.model.objects.filter(pk=OuterRef('pk')).annotate(vector=variant_search_vector()).values('vector')
+        ))
+
+
+class ProductPromotionManager(models.Manager):
+
+    def get_next_boundary(self, now=None):
+        """Return the nearest future datetime that an active promotion starts or ends at, None if there is none"""
+        now = now or timezone.now()
+        boundaries = self.filter(active=True).aggregate(
+            next_start=Min('datetime_start', filter=Q(datetime_start__gt=now)),
+            next_end=Min('datetime_end', filter=Q(datetime_end__gt=now)),
+        )
+        return min(filter(None, boundaries.values()), default=None)
+
+    def get_boundaries(self, since, until):
+        """Return sorted datetimes in (since, until] that active promotions start or end at"""
+        boundaries = set(
+            self.filter(active=True, datetime_start__gt=since, datetime_start__lte=until)
+            .values_list('datetime_start', flat=True)
+        )
+        boundaries.update(
+            self.filter(active=True, datetime_end__gt=since, datetime_end__lte=until)
+            .values_list('datetime_end', flat=True)
+        )
+        return sorted(boundaries)
+
+    def get_boundary_variant_ids(self, since, until):
+        """Return ids of variants whose active promotions started or ended in (since, until]"""
+        return set(
+            self.filter(
+                Q(datetime_start__gt=since, datetime_start__lte=until)
+                | Q(datetime_end__gt=since, datetime_end__lte=until),
+                active=True, product_variants__isnull=False
+            ).values_list('product_variants', flat=True)
+        )
+
 
 class ActiveProductPromotionManager(models.Manager):
 
@@ -58,11 +198,79 @@ class ActiveProductPromotionManager(models.Manager):
         return super().get_queryset().filter(datetime_start__lt=now, datetime_end__gt=now, active=True)
 
 
+# sent with category_ids argument after inherited activation of categories is changed by a bulk update, which sends
+# no post_save for them
+category_activation_changed = Signal()
+
+
+def path_ids(path):
+    """Return ids of categories in a materialized path"""
+    return [int(id_) for id_ in path.strip('/').split('/') if id_]
+
+
+class CategoryFacetManager(models.Manager):
+    # ids of categories whose facets are rebuilt by the next rebuild_category_facets --stale run
+    STALE_KEY = 'products:facets:stale'
+
+    def mark_stale(self, category_ids):
+        category_ids = list(category_ids)
+        if category_ids:
+            get_redis_connection().sadd(self.STALE_KEY, *category_ids)
+
+    def rebuild_stale(self, batch_size=500):
+        """Rebuild facets of categories marked stale, returns number of rebuilt categories. A category marked again
+           while its facets are rebuilt stays marked for the next run.
+        """
+        connection = get_redis_connection()
+        rebuilt = 0
+        while category_ids := connection.spop(self.STALE_KEY, batch_size):
+            for category_id in sorted(int(category_id) for category_id in category_ids):
+                self.rebuild(category_id)
+            rebuilt += len(category_ids)
+        return rebuilt
+
+    def rebuild(self, category_id):
+        """Count active variants in subtree of a category per brand, color and attribute value and replace its
+           stored facets.
+        """
+        path = ProductCategory.objects.filter(pk=category_id).values_list('path', flat=True).first()
+        if path is None:
+            return
+        variants = ProductVariant.active_manager.filter(product__category__path__startswith=path)
+        counts = [
+            (CategoryFacet.FACET_BRAND, variants.values_list('brand').annotate(count=Count('id')).order_by()),
+            (CategoryFacet.FACET_COLOR, variants.values_list('color').annotate(count=Count('id')).order_by()),
+            (
+                CategoryFacet.FACET_ATTRIBUTE_VALUE,
+                ProductAttributeValues.objects.filter(product_variant__in=variants)
+                .values_list('attribute_value').annotate(count=Count('id')).order_by()
+            ),
+        ]
+        facets = [
+            CategoryFacet(category_id=category_id, facet=facet, value_id=value_id, count=count)
+            for facet, facet_counts in counts for value_id, count in facet_counts
+        ]
+        with transaction.atomic():
+            self.filter(category_id=category_id).delete()
+            self.bulk_create(facets)
+
+    def get_counts(self, category_id):
+        """Return stored counts of a category as {facet: {value_id: count}}"""
+        counts = defaultdict(dict)
+        for facet, value_id, count in self.filter(category_id=category_id).values_list('facet', 'value_id', 'count'):
+            counts[facet][value_id] = count
+        return counts
+
+
 class ProductCategory(models.Model):
     """Category for products"""
     name = models.CharField(max_length=128, verbose_name=_('Name'))
     slug = models.SlugField(max_length=128, unique=True, verbose_name=_('Slug'))
     is_active = models.BooleanField(default=True, verbose_name=_('Is active'))
+    # active itself and all of its ancestors, kept by save so active managers need no recursive query
+    effective_is_active = models.BooleanField(
+        default=True, editable=False, db_index=True, verbose_name=_('Effectively active')
+    )
     parent = models.ForeignKey(
         to='self',
         on_delete=models.PROTECT,
@@ -71,13 +279,72 @@ class ProductCategory(models.Model):
         related_name='sub_categories',
         verbose_name=_('Parent category')
     )
+    # materialized path of ids from root like "/1/5/12/", subtree of a category is a prefix match on it
+    path = models.CharField(max_length=255, editable=False, default='', verbose_name=_('Path'))
 
     objects = models.Manager()
     active_manager = ActiveCategoryManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValidationError({'parent': _('A category can not be moved under itself or its sub categories.')})
+
+    def get_ancestor_ids(self):
+        """Return ids from root to this category (itself included) without querying database"""
+        return path_ids(self.path)
+
+    def _update_effective_is_active(self):
+        """Store activation inherited from ancestors on this category and its subtree with a single bulk update"""
+        parent_active = not self.parent_id or bool(
+            self.__class__.objects.filter(pk=self.parent_id).values_list('effective_is_active', flat=True).first()
+        )
+        # a parent path is a prefix of its children paths, so parents always come first
+        subtree = self.__class__.objects.filter(path__startswith=self.path).order_by('path').only(
+            'parent_id', 'is_active', 'effective_is_active'
+        )
+        effective_is_active = {self.parent_id: parent_active}
+        changed = []
+        for category in subtree:
+            effective_is_active[category.id] = category.is_active and effective_is_active[category.parent_id]
+            if category.effective_is_active != effective_is_active[category.id]:
+                category.effective_is_active = effective_is_active[category.id]
+                changed.append(category)
+        self.__class__.objects.bulk_update(changed, ['effective_is_active'], batch_size=500)
+        self.effective_is_active = effective_is_active[self.id]
+        if changed:
+            category_activation_changed.send(sender=self.__class__, category_ids=[category.id for category in changed])
+
+    def save(self, *args, **kwargs):
+        """Store path after saving, since id of a new category is part of it, and move paths of the subtree along.
+           Inherited activation of the subtree is stored afterwards, since both moving and toggling change it.
+        """
+        with transaction.atomic():
+            self._previous_path = (
+                self.__class__.objects.filter(pk=self.pk).values_list('path', flat=True).first() or ''
+                if self.pk else ''
+            )
+            super().save(*args, **kwargs)
+            parent_path = (
+                self.__class__.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+                if self.parent_id else '/'
+            )
+            self.path = f'{parent_path}{self.id}/'
+            if self.path != self._previous_path:
+                self.__class__.objects.filter(pk=self.pk).update(path=self.path)
+                if self._previous_path:
+                    self.__class__.objects.filter(path__startswith=self._previous_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(self.path), Substr('path', len(self._previous_path) + 1))
+                    )
+            self._update_effective_is_active()
+
 
 class Brand(models.Model):
     """Brand for products"""
@@ -163,6 +430,10 @@ class Product(models.Model):
     datetime_created = models.DateTimeField(auto_now_add=True, verbose_name=_('Datetime created'))
     datetime_modified = models.DateTimeField(auto_now=True, verbose_name=_('Datetime modified'))
     score = models.FloatField(verbose_name=_('Score'), editable=False, default=0)
+    # counters of verified comments, only changed by ProductManager.update_counters
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Comments count'))
+    score_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Score sum'))
+    rated_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Rated comments count'))
     category = models.ForeignKey(
         ProductCategory,
         on_delete=models.PROTECT,
@@ -170,9 +441,11 @@ class Product(models.Model):
         verbose_name=_('Category')
     )
 
-    objects = models.Manager()
+    objects = ProductManager()
     active_manager = ActiveProductManager()
 
+    COUNTER_FIELDS = ('comments_count', 'score_sum', 'rated_count', 'score')
+
     class Meta:
         verbose_name = _('Product')
         verbose_name_plural = _('Products')
@@ -180,6 +453,15 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Counters are updated in database directly, so saving a loaded product must not overwrite them"""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class ProductVariant(models.Model):
     """Store info about each product variant for example red xl variant for t-shirt"""
@@ -190,7 +472,27 @@ class ProductVariant(models.Model):
     retail_price_dollar = models.DecimalField(max_digits=7, decimal_places=2, verbose_name=_('Retail price dollar'))
     store_price_toman = models.PositiveIntegerField(verbose_name=_('Store price toman'))
     store_price_dollar = models.DecimalField(max_digits=7, decimal_places=2, verbose_name=_('Store price dollar'))
-    thumbnail_image = models.ImageField(upload_to='products/', verbose_name=_('Thumbnail image'))
+    # denormalized from active promotion, kept up to date by ProductVariantManager.refresh_prices
+    discount_percent = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Discount percent'))
+    price_toman = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Price toman'))
+    price_dollar = models.DecimalField(
+        max_digits=7, decimal_places=2, default=0, editable=False, verbose_name=_('Price dollar')
+    )
+    # sort keys of listings, copied from product score and stock by ProductManager.update_counters and signals
+    score = models.FloatField(default=0, editable=False, verbose_name=_('Score'))
+    units_sold = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Units Sold'))
+    # kept up to date by signals with ProductVariantManager.update_search_vectors
+    search_vector = SearchVectorField(null=True, editable=False)
+    # identical images share a file, indexed since a file is deleted only when no row refers to it anymore
+    thumbnail_image = models.ImageField(
+        upload_to='products/', storage=product_image_storage, db_index=True, verbose_name=_('Thumbnail image')
+    )
+    thumbnail_width = models.PositiveIntegerField(null=True, editable=False, verbose_name=_('Thumbnail width'))
+    thumbnail_height = models.PositiveIntegerField(null=True, editable=False, verbose_name=_('Thumbnail height'))
+    thumbnail_color = models.CharField(
+        max_length=7, blank=True, editable=False, verbose_name=_('Thumbnail dominant color')
+    )
+    thumbnail_placeholder = models.TextField(blank=True, editable=False, verbose_name=_('Thumbnail placeholder'))
     is_digital = models.BooleanField(default=False, verbose_name=_('Is digital'), help_text=_('Software and ..'))
     datetime_created = models.DateTimeField(auto_now_add=True, verbose_name=_('Datetime created'))
     datetime_modified = models.DateTimeField(auto_now=True, verbose_name=_('Datetime modified'))
@@ -230,40 +532,84 @@ class ProductVariant(models.Model):
         verbose_name=_('Color')
     )
 
-    objects = models.Manager()
+    objects = ProductVariantManager()
     active_manager = ActiveProductVariantManager()
 
+    DENORMALIZED_FIELDS = ('score', 'units_sold', 'search_vector')
+    THUMBNAIL_METADATA_FIELDS = ('thumbnail_width', 'thumbnail_height', 'thumbnail_color', 'thumbnail_placeholder')
+
     class Meta:
         unique_together = (('product', 'color'),)
+        indexes = [
+            models.Index(
+                fields=['discount_percent'], condition=Q(discount_percent__gt=0), name='discounted_variants_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='variant_search_vector_idx'),
+            # listing sort orders, id breaks ties so pages are stable
+            models.Index(fields=['price_toman', 'id'], name='variant_price_toman_idx'),
+            models.Index(fields=['price_dollar', 'id'], name='variant_price_dollar_idx'),
+            models.Index(fields=['-score', '-id'], name='variant_score_idx'),
+            models.Index(fields=['-units_sold', '-id'], name='variant_units_sold_idx'),
+        ]
         verbose_name = _('Product Variant')
         verbose_name_plural = _('Product Variants')
 
     def __str__(self):
         return f'{self.product.name}-{self.sku}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so thumbnails are generated only when another image is saved
+        if 'thumbnail_image' in field_names:
+            instance._db_thumbnail_image = instance.thumbnail_image.name
+        return instance
+
     def get_absolute_url(self):
         return reverse('products:product-variant-detail', args=(self.sku, self.product.slug,))
 
-    def get_random_related_variants(self):
-        """Method for displaying related products (their default variant) in product detail page"""
-        related_product__product_variants_ids = (
-            ProductVariant.active_manager.filter(product__category_id=self.product.category_id, is_default=True)
-            .exclude(product_id=self.product_id)
+    @cached_property
+    def specifications(self):
+        """Attribute values of variant with is_feature annotated, shared between features and specifications
+           components, loaded on first access so cached template fragments don't hit database.
+        """
+        return list(
+            self.attribute_values.select_related('product_attribute')
+            .annotate(is_feature=F('product_attr_values__is_feature'))
         )
-        try:
-            chosen_ids = random.sample(list(related_product__product_variants_ids), 8)
-        except ValueError:
-            chosen_ids = related_product__product_variants_ids
 
-        return ProductVariant.active_manager.get_variants_list().filter(id__in=chosen_ids)
+    @cached_property
+    def color_variants(self):
+        """Active variants of the same product for color selection, loaded on first access like specifications"""
+        return list(self.product.variants.select_related('color').filter(is_active=True))
+
+    def get_random_related_variants(self, count=8):
+        """Method for displaying related products (their default variant) in product detail page, candidates are
+           sampled from the category related pool, so the category is never loaded as a whole.
+        """
+        category_id = self.product.category_id
+        # one more is sampled, in case this product itself is chosen
+        members = related_pools.sample_pool(category_id, count + 1)
+        if members is None:
+            members = ProductVariant.active_manager.get_related_pool_members(category_id)
+            related_pools.fill_pool(category_id, members)
+            members = random.sample(members, min(len(members), count + 1))
+        chosen_ids = [variant_id for product_id, variant_id in members if product_id != self.product_id][:count]
+
+        return ProductVariant.active_manager.get_variants_list().filter(
+            id__in=chosen_ids, is_default=True, product__category_id=category_id
+        )
 
     def get_price_toman(self):
-        """This method is intended to be called on objects of a queryset with annotated discount_percent"""
-        return int(self.store_price_toman * (1 - self.discount_percent / 100))
+        return self.price_toman
 
     def get_price_dollar(self):
-        """This method is intended to be called on objects of a queryset with annotated discount_percent"""
-        return round(self.store_price_dollar * Decimal(1 - self.discount_percent / 100), 2)
+        return self.price_dollar
+
+    def calculate_prices(self):
+        """Calculate final prices from store prices and stored discount, same as ProductVariantManager.refresh_prices"""
+        self.price_toman = int(self.store_price_toman) * (100 - self.discount_percent) // 100
+        self.price_dollar = round(Decimal(self.store_price_dollar) * (100 - self.discount_percent) / 100, 2)
 
     def replace_default_variant(self):
         """When setting is_default to True checks if there is already default variant for that product, if was it will
@@ -275,8 +621,18 @@ class ProductVariant(models.Model):
             self.product.variants.exclude(pk=self.pk).filter(is_default=True).update(is_default=False)
 
     def save(self, *args, **kwargs):
+        """Denormalized fields are updated in database directly, so saving a loaded variant must not overwrite them"""
+        if self._state.adding:
+            self.score = Product.objects.filter(pk=self.product_id).values_list('score', flat=True).first() or 0
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        update_image_metadata(self, 'thumbnail_image', self.THUMBNAIL_METADATA_FIELDS)
         with transaction.atomic():
             self.replace_default_variant()
+            self.calculate_prices()
             super().save(*args, **kwargs)
 
 
@@ -288,9 +644,17 @@ class ProductImage(models.Model):
         on_delete=models.CASCADE,
         verbose_name=_('Product variant')
     )
-    image = models.ImageField(upload_to='products/', verbose_name=_('Image'))
+    image = models.ImageField(
+        upload_to='products/', storage=product_image_storage, db_index=True, verbose_name=_('Image')
+    )
+    width = models.PositiveIntegerField(null=True, editable=False, verbose_name=_('Width'))
+    height = models.PositiveIntegerField(null=True, editable=False, verbose_name=_('Height'))
+    dominant_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name=_('Dominant color'))
+    placeholder = models.TextField(blank=True, editable=False, verbose_name=_('Placeholder'))
     alt_text = models.CharField(max_length=128, verbose_name=_('alt text'))  # auto generate
 
+    METADATA_FIELDS = ('width', 'height', 'dominant_color', 'placeholder')
+
     class Meta:
         verbose_name = _('Product image')
         verbose_name_plural = _('Product images')
@@ -298,6 +662,19 @@ class ProductImage(models.Model):
     def __str__(self):
         return self.alt_text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance._db_image = instance.image.name
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_image_metadata(self, 'image', self.METADATA_FIELDS)
+        # image is stored in the transaction of the row, see ContentHashStorage
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ProductAttributeValues(models.Model):
     """Store related attribute-values for each product variant"""
@@ -377,7 +754,7 @@ class ProductPromotion(models.Model):
     active = models.BooleanField(default=True, verbose_name=_('Active'))
 
     active_manager = ActiveProductPromotionManager()
-    objects = models.Manager()
+    objects = ProductPromotionManager()
 
     class Meta:
         verbose_name = _('Promotion')
@@ -397,3 +774,39 @@ class ProductPromotion(models.Model):
     def remaining_time(self):
         now = timezone.now()
         return format_timedelta(self.datetime_end - now) if self.datetime_end >= now else 0
+
+
+class CategoryFacet(models.Model):
+    """Count of active variants of a category per filter value, so filter sidebars never run a GROUP BY on the
+       variants of a category. Signals mark categories of changed variants stale and rebuild_category_facets --stale
+       rebuilds them out of web requests.
+    """
+    FACET_BRAND = 1
+    FACET_COLOR = 2
+    FACET_ATTRIBUTE_VALUE = 3
+
+    FACET_CHOICES = [
+        (FACET_BRAND, _('Brand')),
+        (FACET_COLOR, _('Color')),
+        (FACET_ATTRIBUTE_VALUE, _('Attribute value')),
+    ]
+    category = models.ForeignKey(
+        ProductCategory,
+        on_delete=models.CASCADE,
+        related_name='facets',
+        verbose_name=_('Category')
+    )
+    facet = models.PositiveSmallIntegerField(choices=FACET_CHOICES, verbose_name=_('Facet'))
+    # id of brand, color or attribute value depending on facet
+    value_id = models.PositiveIntegerField(verbose_name=_('Value id'))
+    count = models.PositiveIntegerField(verbose_name=_('Product variants count'))
+
+    objects = CategoryFacetManager()
+
+    class Meta:
+        unique_together = (('category', 'facet', 'value_id'),)
+        verbose_name = _('Category facet')
+        verbose_name_plural = _('Category facets')
+
+    def __str__(self):
+        return f'{self.category_id}:{self.get_facet_display()}:{self.value_id}'
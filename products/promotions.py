@@ -0,0 +1,92 @@
+"""Applying promotions when they start or end, and cache timeouts that end at the next of these boundaries."""
+from datetime import timedelta
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import ProductPromotion, ProductVariant
+from .cache import bump_catalog_version, invalidate_variants
+
+NEXT_BOUNDARY_KEY = 'products:next-promotion-boundary'
+
+# sent with variant_ids argument after prices of variants are updated because their promotion started or ended
+promotion_boundary_reached = Signal()
+
+_missing = object()
+_active_promotions = None
+
+
+def refresh_next_boundary():
+    """Store next datetime that a promotion starts or ends at in cache, until it is reached"""
+    now = timezone.now()
+    next_boundary = ProductPromotion.objects.get_next_boundary(now)
+    timeout = ceil((next_boundary - now).total_seconds()) if next_boundary else settings.CACHE_TTL
+    cache.set(NEXT_BOUNDARY_KEY, next_boundary, timeout)
+    return next_boundary
+
+
+def get_next_boundary():
+    next_boundary = cache.get(NEXT_BOUNDARY_KEY, _missing)
+    if next_boundary is _missing:
+        next_boundary = refresh_next_boundary()
+    return next_boundary
+
+
+class ActivePromotions:
+    """Process local snapshot of whether any promotion is active and when the next one starts or ends"""
+
+    def __init__(self, any_active, next_boundary, expires_at):
+        self.any_active = any_active
+        self.next_boundary = next_boundary
+        self.expires_at = expires_at
+
+    def __bool__(self):
+        return self.any_active
+
+
+def get_active_promotions():
+    """Return snapshot of active promotions of this process, loading it again when it is expired"""
+    global _active_promotions
+    now = timezone.now()
+    if _active_promotions is None or _active_promotions.expires_at <= now:
+        next_boundary = get_next_boundary()
+        expires_at = now + timedelta(seconds=settings.ACTIVE_PROMOTIONS_LOCAL_TTL)
+        _active_promotions = ActivePromotions(
+            ProductPromotion.active_manager.exists(),
+            next_boundary,
+            min(expires_at, next_boundary) if next_boundary else expires_at
+        )
+    return _active_promotions
+
+
+def clear_active_promotions():
+    global _active_promotions
+    _active_promotions = None
+
+
+def get_price_cache_ttl():
+    """Timeout for cached contents with prices in them, so they expire when the next promotion starts or ends"""
+    next_boundary = get_active_promotions().next_boundary
+    if next_boundary is None:
+        return settings.CACHE_TTL
+    return max(1, min(settings.CACHE_TTL, ceil((next_boundary - timezone.now()).total_seconds())))
+
+
+def apply_promotion_boundaries(variant_ids=None):
+    """Update prices of given variants (all if not given) whose promotion started or ended, drop their cached contents
+       and send promotion_boundary_reached, returns ids of updated variants.
+    """
+    with transaction.atomic():
+        changed_ids = ProductVariant.objects.refresh_prices(variant_ids)
+        if changed_ids:
+            invalidate_variants(ProductVariant.objects.filter(id__in=changed_ids).values_list('id', 'sku'))
+            transaction.on_commit(bump_catalog_version)
+    refresh_next_boundary()
+    clear_active_promotions()
+    if changed_ids:
+        promotion_boundary_reached.send(sender=ProductPromotion, variant_ids=changed_ids)
+    return changed_ids
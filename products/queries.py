@@ -1,31 +1,98 @@
-from django.db.models import Prefetch, F, Count, Q
+from collections import defaultdict
 
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, OuterRef, F
 
-from comments.models import ProductComment
-from products.models import ProductVariant, ProductAttributeValue
+from products.models import ProductVariant, ProductAttributeValue, ProductAttributeValues
+from products.forms import ListingSortForm
 
 
 def product_detail_info():
-    product__variants = Prefetch(
-        'product__variants', ProductVariant.objects.select_related('color').filter(is_active=True)
-    )
-    attribute_values = Prefetch(
-        'attribute_values',
-        ProductAttributeValue.objects.select_related('product_attribute')
-        .annotate(is_feature=F('product_attr_values__is_feature'))
-    )
-    product__comments = Prefetch(
-        'product__comments',
-        ProductComment.active_manager.select_related('user').filter(parent__isnull=True)
-        .prefetch_related(Prefetch('replies', ProductComment.active_manager.filter(parent__isnull=False)))
+    """Images, specifications and color variants are not prefetched here, they are only needed by cached template
+       fragments and loaded by them on a cache miss. Comments are loaded page by page by ProductCommentPartial.
+    """
+    return ProductVariant.active_manager.get_variants_list().select_related('color')
+
+
+def sort_variants(variants, sort, price_field='price_toman'):
+    """Order variants by a ListingSortForm sort, each order has its own index on variants table so pages are read
+       in index order without joining stock or product.
+    """
+    orderings = {
+        ListingSortForm.SORT_NEWEST: ['-id'],
+        ListingSortForm.SORT_CHEAPEST: [price_field, 'id'],
+        ListingSortForm.SORT_MOST_EXPENSIVE: [f'-{price_field}', '-id'],
+        ListingSortForm.SORT_TOP_RATED: ['-score', '-id'],
+        ListingSortForm.SORT_BEST_SELLING: ['-units_sold', '-id'],
+    }
+    return variants.order_by(*orderings[sort])
+
+
+def group_attribute_values(value_ids):
+    """Return given attribute value ids grouped by their attribute, unknown ids are dropped"""
+    attribute_values = defaultdict(list)
+    for value_id, attribute_id in ProductAttributeValue.objects.filter(pk__in=value_ids).values_list(
+        'id', 'product_attribute_id'
+    ):
+        attribute_values[attribute_id].append(value_id)
+    return list(attribute_values.values())
+
+
+class VariantIdsList:
+    """Ordered active variant ids that load only the sliced ones from database, so a paginator over ids found
+       elsewhere (e.g. filter bitmaps) runs a single primary key query per page.
+    """
+
+    def __init__(self, variant_ids):
+        self.variant_ids = variant_ids
+
+    def __len__(self):
+        return len(self.variant_ids)
+
+    def __getitem__(self, index):
+        variant_ids = self.variant_ids[index] if isinstance(index, slice) else [self.variant_ids[index]]
+        variants = ProductVariant.active_manager.get_variants_list().in_bulk(variant_ids)
+        # ids may be slightly stale, variants that are not active anymore are skipped
+        variants = [variants[variant_id] for variant_id in variant_ids if variant_id in variants]
+        return variants if isinstance(index, slice) else variants[0]
+
+
+def category_variants_list(category, filters, sort=ListingSortForm.SORT_NEWEST, price_field='price_toman'):
+    """Active variants in subtree of a category narrowed by CategoryFilterForm filters. Selected values of an
+       attribute are OR-ed and different attributes are AND-ed, each as an EXISTS so no DISTINCT is needed.
+    """
+    variants = sort_variants(
+        ProductVariant.active_manager.get_variants_list().filter(product__category__path__startswith=category.path),
+        sort, price_field
     )
+    if 'brand' in filters:
+        variants = variants.filter(brand_id__in=filters['brand'])
+    if 'color' in filters:
+        variants = variants.filter(color_id__in=filters['color'])
+    if 'min_price' in filters:
+        variants = variants.filter(**{f'{price_field}__gte': filters['min_price']})
+    if 'max_price' in filters:
+        variants = variants.filter(**{f'{price_field}__lte': filters['max_price']})
+    if 'attribute_value' in filters:
+        attribute_values = group_attribute_values(filters['attribute_value'])
+        if not attribute_values:
+            return variants.none()
+        for value_ids in attribute_values:
+            variants = variants.filter(Exists(
+                ProductAttributeValues.objects.filter(product_variant=OuterRef('pk'), attribute_value_id__in=value_ids)
+            ))
+    return variants
+
 
+def search_variants(query):
+    """Active variants matching query ordered by relevance. Query is parsed with both configurations used by search
+       documents, so Persian words match as they are and English words also match their other forms.
+    """
+    search_query = (
+        SearchQuery(query, config='simple', search_type='websearch')
+        | SearchQuery(query, config='english', search_type='websearch')
+    )
     return (
-        ProductVariant.active_manager.get_variants_list().select_related('color')
-        .prefetch_related('images', product__variants, attribute_values, product__comments).annotate(
-            product__comments_count=Count(
-                'product__comments',
-                filter=Q(product__comments__is_verified=True, product__comments__parent__isnull=True)
-            ),
-        )
+        ProductVariant.active_manager.get_variants_list().filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query)).order_by('-rank', '-id')
     )
@@ -0,0 +1,61 @@
+"""Per category pools of active default variants kept in Redis sets, used for sampling related products.
+
+Members are stored as "product_id:variant_id" so the sampled product itself can be dropped without a query.
+Pools are only candidates, sampled ids are always hydrated through the active manager, so a stale member is just
+filtered out and never displayed.
+"""
+from django_redis import get_redis_connection
+
+POOL_KEY = 'products:related-pool:{}'
+# stored in every built pool, so an empty category is not rebuilt on each request
+EMPTY_POOL_SENTINEL = b'0:0'
+
+# members are only changed on built pools, adding to a missing key would create a pool with a single member
+UPDATE_POOL_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+if #ARGV > 1 then redis.call('SREM', KEYS[1], unpack(ARGV, 2)) end
+if ARGV[1] ~= '' then redis.call('SADD', KEYS[1], ARGV[1]) end
+return 1
+"""
+
+
+def _pool_key(category_id):
+    return POOL_KEY.format(category_id)
+
+
+def _member(product_id, variant_id):
+    return f'{product_id}:{variant_id}'
+
+
+def sample_pool(category_id, count):
+    """Return up to count random (product_id, variant_id) pairs in O(count), None when pool is not built yet"""
+    members = get_redis_connection().srandmember(_pool_key(category_id), count + 1)
+    if not members:
+        return None
+    return [
+        tuple(map(int, member.split(b':'))) for member in members if member != EMPTY_POOL_SENTINEL
+    ][:count]
+
+
+def fill_pool(category_id, members):
+    """Replace pool of a category with given (product_id, variant_id) pairs"""
+    key = _pool_key(category_id)
+    with get_redis_connection().pipeline() as pipe:
+        pipe.delete(key)
+        pipe.sadd(key, EMPTY_POOL_SENTINEL, *(_member(product_id, variant_id) for product_id, variant_id in members))
+        pipe.execute()
+
+
+def update_pool(category_id, product_id, variant_ids, default_variant_id=None):
+    """Remove given variants of a product from pool and add its default variant if there is an active one.
+       Pools that are not built yet are left alone, they will be filled from database on first sample.
+    """
+    get_redis_connection().eval(
+        UPDATE_POOL_SCRIPT, 1, _pool_key(category_id),
+        _member(product_id, default_variant_id) if default_variant_id else '',
+        *(_member(product_id, variant_id) for variant_id in variant_ids)
+    )
+
+
+def drop_pool(category_id):
+    get_redis_connection().delete(_pool_key(category_id))
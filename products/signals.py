@@ -0,0 +1,341 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import models
+from .cache import bump_catalog_version, invalidate_variant_pages, invalidate_variants
+from .related_pools import update_pool, drop_pool
+from .promotions import refresh_next_boundary, clear_active_promotions, promotion_boundary_reached
+from .home_sections import build_home_sections, mark_home_sections_stale
+from . import suggestions, filter_bitmaps
+from .categories import clear_category_tree
+from .thumbnails import image_saved, release_images
+
+# categories whose facets are marked stale when transaction of this thread commits
+_stale_facets = threading.local()
+
+
+def invalidate_product_pages(product_id):
+    """Drop cached detail pages of all variants of a product, they share colors, comments and score"""
+    invalidate_variants(models.ProductVariant.objects.filter(product_id=product_id).values_list('id', 'sku'))
+
+
+def sync_related_pool(product_id, category_id):
+    """Put the active default variant of product (if any) in related pool of category instead of its other variants"""
+    variant_ids = list(models.ProductVariant.objects.filter(product_id=product_id).values_list('id', flat=True))
+    default_variant_id = (
+        models.ProductVariant.active_manager.filter(product_id=product_id, is_default=True)
+        .values_list('id', flat=True).first()
+    )
+    transaction.on_commit(lambda: update_pool(category_id, product_id, variant_ids, default_variant_id))
+
+
+def update_suggestions(update):
+    """Apply update to suggestion index of this process after commit"""
+    transaction.on_commit(lambda: suggestions.apply_update(update))
+
+
+def update_filter_bitmaps(variant_ids):
+    variant_ids = list(variant_ids)
+    transaction.on_commit(lambda: filter_bitmaps.update_variants(variant_ids))
+
+
+def _mark_pending_facets_stale():
+    category_ids, _stale_facets.category_ids = _stale_facets.category_ids, set()
+    if not category_ids:
+        return
+    paths = models.ProductCategory.objects.filter(pk__in=category_ids).values_list('path', flat=True)
+    models.CategoryFacet.objects.mark_stale({ancestor_id for path in paths for ancestor_id in models.path_ids(path)})
+
+
+def mark_category_facets_stale(category_id):
+    """Mark facets of a category and its ancestors stale after commit, facets of a category count its whole subtree.
+       Categories are collected until commit, so a transaction that changes many products marks each of them once.
+    """
+    if not hasattr(_stale_facets, 'category_ids'):
+        _stale_facets.category_ids = set()
+    _stale_facets.category_ids.add(category_id)
+    # every call registers the callback so it survives a rolled back savepoint, the first one that runs takes all ids
+    transaction.on_commit(_mark_pending_facets_stale)
+
+
+@receiver(post_save, sender=models.Product)
+def product_search_document_changed(sender, instance, **kwargs):
+    models.ProductVariant.objects.update_search_vectors(instance.variants.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=models.ProductVariant)
+def product_variant_search_document_changed(sender, instance, **kwargs):
+    models.ProductVariant.objects.update_search_vectors([instance.id])
+
+
+@receiver(post_save, sender=models.Brand)
+@receiver(post_save, sender=models.Color)
+def variant_relation_search_document_changed(sender, instance, **kwargs):
+    models.ProductVariant.objects.update_search_vectors(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=models.ProductAttributeValue)
+def attribute_value_search_document_changed(sender, instance, **kwargs):
+    models.ProductVariant.objects.update_search_vectors(instance.product_variants.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=models.ProductAttributeValues)
+def product_variant_attributes_search_document_changed(sender, instance, **kwargs):
+    models.ProductVariant.objects.update_search_vectors([instance.product_variant_id])
+
+
+@receiver(pre_save, sender=models.Product)
+def product_saving(sender, instance, **kwargs):
+    instance._db_category_id = (
+        models.Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=models.Product)
+def product_changed(sender, instance, **kwargs):
+    invalidate_product_pages(instance.id)
+
+
+@receiver(post_save, sender=models.Product)
+def product_saved(sender, instance, **kwargs):
+    db_category_id = getattr(instance, '_db_category_id', None)
+    if db_category_id and db_category_id != instance.category_id:
+        variant_ids = list(instance.variants.values_list('id', flat=True))
+        transaction.on_commit(lambda: update_pool(db_category_id, instance.id, variant_ids))
+        mark_category_facets_stale(db_category_id)
+    sync_related_pool(instance.id, instance.category_id)
+    mark_category_facets_stale(instance.category_id)
+
+
+@receiver(post_delete, sender=models.Product)
+def product_deleted(sender, instance, **kwargs):
+    mark_category_facets_stale(instance.category_id)
+
+
+@receiver([post_save, post_delete], sender=models.ProductVariant)
+def product_variant_changed(sender, instance, **kwargs):
+    # deleted variant is not in database anymore, so it's added by hand
+    invalidate_variants([(instance.id, instance.sku)])
+    invalidate_product_pages(instance.product_id)
+
+
+@receiver(post_save, sender=models.ProductVariant)
+def product_variant_saved(sender, instance, **kwargs):
+    sync_related_pool(instance.product_id, instance.product.category_id)
+    mark_category_facets_stale(instance.product.category_id)
+
+
+@receiver(post_save, sender=models.ProductVariant)
+def product_variant_thumbnail_saved(sender, instance, **kwargs):
+    image_saved(instance, 'thumbnail_image')
+
+
+@receiver(post_save, sender=models.ProductImage)
+def product_image_saved(sender, instance, **kwargs):
+    image_saved(instance, 'image')
+
+
+@receiver(post_delete, sender=models.ProductVariant)
+@receiver(post_delete, sender=models.ProductImage)
+def product_image_deleted(sender, instance, **kwargs):
+    name = (instance.thumbnail_image if sender is models.ProductVariant else instance.image).name
+    transaction.on_commit(lambda: release_images([name]))
+
+
+@receiver(post_delete, sender=models.ProductVariant)
+def product_variant_deleted(sender, instance, **kwargs):
+    category_id = instance.product.category_id
+    transaction.on_commit(lambda: update_pool(category_id, instance.product_id, [instance.id]))
+    mark_category_facets_stale(category_id)
+
+
+@receiver(post_save, sender=models.ProductCategory)
+def product_category_saved(sender, instance, **kwargs):
+    # activating a category changes all of its members, the pool is filled again from database on first sample
+    transaction.on_commit(lambda: drop_pool(instance.id))
+    mark_category_facets_stale(instance.id)
+    previous_path = getattr(instance, '_previous_path', '')
+
+    def rebuild_old_ancestors():
+        # path is stored after post_save is sent, but it's final once committed
+        if previous_path and previous_path != instance.path:
+            # category is moved, its old ancestors lost the subtree
+            models.CategoryFacet.objects.mark_stale(
+                models.path_ids(previous_path[:previous_path.rstrip('/').rfind('/') + 1])
+            )
+    transaction.on_commit(rebuild_old_ancestors)
+
+
+@receiver(models.category_activation_changed)
+def category_subtree_activation_changed(sender, category_ids, **kwargs):
+    # sub categories are bulk updated, they get no post_save of their own
+    def drop_pools():
+        for category_id in category_ids:
+            drop_pool(category_id)
+    transaction.on_commit(drop_pools)
+    for category_id in category_ids:
+        mark_category_facets_stale(category_id)
+    update_suggestions(lambda index: index.add_categories(category_ids))
+
+
+@receiver([post_save, post_delete], sender=models.ProductCategory)
+def product_category_changed(sender, instance, **kwargs):
+    # category names and links are in breadcrumbs and menus of every page
+    transaction.on_commit(clear_category_tree)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver([post_save, post_delete], sender=models.ProductAttributeValues)
+def product_variant_attribute_value_changed(sender, instance, **kwargs):
+    category_id = (
+        models.Product.objects.filter(variants__id=instance.product_variant_id)
+        .values_list('category_id', flat=True).first()
+    )
+    if category_id:
+        mark_category_facets_stale(category_id)
+
+
+@receiver(post_save, sender=models.Color)
+def color_changed(sender, instance, **kwargs):
+    invalidate_variants(
+        models.ProductVariant.objects.filter(product__variants__color=instance).values_list('id', 'sku').distinct()
+    )
+
+
+@receiver(post_save, sender=models.ProductAttributeValue)
+def attribute_value_changed(sender, instance, **kwargs):
+    invalidate_variants(instance.product_variants.values_list('id', 'sku'))
+
+
+@receiver([post_save, post_delete], sender=models.ProductAttributeValues)
+@receiver([post_save, post_delete], sender=models.ProductImage)
+def product_variant_relation_changed(sender, instance, **kwargs):
+    invalidate_variants(models.ProductVariant.objects.filter(pk=instance.product_variant_id).values_list('id', 'sku'))
+
+
+@receiver(post_save, sender=models.Stock)
+def stock_saved(sender, instance, **kwargs):
+    models.ProductVariant.objects.filter(pk=instance.product_variant_id).update(
+        units_sold=instance.units_sold, datetime_modified=timezone.now()
+    )
+
+
+@receiver(post_delete, sender=models.Stock)
+def stock_deleted(sender, instance, **kwargs):
+    models.ProductVariant.objects.filter(pk=instance.product_variant_id).update(
+        units_sold=0, datetime_modified=timezone.now()
+    )
+
+
+@receiver([post_save, post_delete], sender=models.Stock)
+def stock_changed(sender, instance, **kwargs):
+    # stock only changes in_stock, which cached fragments already vary on, so only pages are dropped
+    skus = list(models.ProductVariant.objects.filter(pk=instance.product_variant_id).values_list('sku', flat=True))
+    transaction.on_commit(lambda: invalidate_variant_pages(skus))
+
+
+@receiver(promotion_boundary_reached)
+def promotion_boundary_applied(sender, variant_ids, **kwargs):
+    # deals section and prices of all sections are changed, boundaries are applied by commands so it's built right away
+    build_home_sections()
+
+
+@receiver([post_save, post_delete], sender=models.ProductPromotion)
+def product_promotion_changed(sender, instance, **kwargs):
+    # promotions change prices all over related products sliders and discount banner, drop every cached page
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(refresh_next_boundary)
+    transaction.on_commit(clear_active_promotions)
+    transaction.on_commit(mark_home_sections_stale)
+
+
+@receiver(post_save, sender=models.ProductPromotion)
+def product_promotion_saved(sender, instance, **kwargs):
+    models.ProductVariant.objects.refresh_prices(instance.product_variants.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=models.ProductPromotion)
+def product_promotion_deleting(sender, instance, **kwargs):
+    # relations are deleted before post_delete is sent
+    instance._variant_ids = list(instance.product_variants.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=models.ProductPromotion)
+def product_promotion_deleted(sender, instance, **kwargs):
+    models.ProductVariant.objects.refresh_prices(instance._variant_ids)
+
+
+@receiver(m2m_changed, sender=models.ProductPromotion.product_variants.through)
+def product_promotion_variants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._variant_ids = (
+            [instance.id] if reverse else list(instance.product_variants.values_list('id', flat=True))
+        )
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            variant_ids = instance._variant_ids
+        else:
+            variant_ids = [instance.id] if reverse else pk_set
+        models.ProductVariant.objects.refresh_prices(variant_ids)
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(clear_active_promotions)
+        transaction.on_commit(mark_home_sections_stale)
+
+
+@receiver([post_save, post_delete], sender=models.Product)
+def product_suggestion_changed(sender, instance, **kwargs):
+    update_suggestions(lambda index: index.add_product(instance.id))
+
+
+@receiver([post_save, post_delete], sender=models.ProductVariant)
+def product_variant_suggestion_changed(sender, instance, **kwargs):
+    # default variant or its sku may be changed, which is what product suggestion links to
+    update_suggestions(lambda index: index.add_product(instance.product_id))
+
+
+@receiver(post_save, sender=models.Brand)
+def brand_suggestion_changed(sender, instance, **kwargs):
+    update_suggestions(lambda index: index.add_brand(instance))
+
+
+@receiver(post_save, sender=models.ProductCategory)
+def category_suggestion_changed(sender, instance, **kwargs):
+    update_suggestions(lambda index: index.add_category(instance))
+
+
+@receiver(post_delete, sender=models.Brand)
+@receiver(post_delete, sender=models.ProductCategory)
+def suggestion_deleted(sender, instance, **kwargs):
+    kind = suggestions.BRAND if sender is models.Brand else suggestions.CATEGORY
+    update_suggestions(lambda index: index.remove(kind, instance.id))
+
+
+@receiver(post_save, sender=models.Product)
+def product_filter_bitmaps_changed(sender, instance, **kwargs):
+    update_filter_bitmaps(instance.variants.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=models.ProductVariant)
+def product_variant_filter_bitmaps_changed(sender, instance, **kwargs):
+    update_filter_bitmaps([instance.id])
+
+
+@receiver([post_save, post_delete], sender=models.ProductAttributeValues)
+def product_variant_attributes_filter_bitmaps_changed(sender, instance, **kwargs):
+    update_filter_bitmaps([instance.product_variant_id])
+
+
+@receiver(post_save, sender=models.ProductCategory)
+def category_filter_bitmaps_changed(sender, instance, **kwargs):
+    def update():
+        # path is final once committed, moving or toggling a category changes its whole subtree
+        filter_bitmaps.update_variants(
+            models.ProductVariant.objects.filter(product__category__path__startswith=instance.path)
+            .values_list('id', flat=True)
+        )
+    transaction.on_commit(update)
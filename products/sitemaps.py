@@ -0,0 +1,82 @@
+"""Sitemaps of active product variants, streamed from chunked queries and cached once fully sent.
+
+Variants are split into child sitemaps by id range, a range holds at most SITEMAP_PAGE_SIZE variants so with a url per
+language a child stays under the protocol limit of 50,000 urls. Ranges are fixed, so a child url always lists the same
+variants and a change only touches the one it belongs to.
+"""
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.urls import reverse
+
+from .models import ProductVariant
+
+SITEMAP_KEY = 'products:sitemap:{}:{}'
+MAX_URLS = 50_000
+SITEMAP_PAGE_SIZE = MAX_URLS // len(settings.LANGUAGES)
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_START = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_START = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def _get_page_variants(page):
+    return ProductVariant.active_manager.filter(
+        id__gte=page * SITEMAP_PAGE_SIZE, id__lt=(page + 1) * SITEMAP_PAGE_SIZE
+    )
+
+
+def page_exists(page):
+    return _get_page_variants(page).exists()
+
+
+def iter_index(base_url):
+    """Yield sitemap index, one child per id range that has an active variant"""
+    pages = (
+        ProductVariant.active_manager.annotate(page=F('id') / SITEMAP_PAGE_SIZE).values('page')
+        .annotate(lastmod=Max('datetime_modified')).order_by('page')
+    )
+    yield XML_HEADER + INDEX_START
+    for page in pages:
+        location = escape(base_url + reverse('sitemap-products', args=(page['page'],)))
+        yield f'<sitemap><loc>{location}</loc><lastmod>{page["lastmod"].date().isoformat()}</lastmod></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def iter_page(page, base_url):
+    """Yield child sitemap of an id range, with a url for each distinct slug of a variant's product"""
+    languages = [language for language, _name in settings.LANGUAGES]
+    variants = (
+        _get_page_variants(page).select_related('product')
+        .only('sku', 'datetime_modified', 'product', *(f'product__slug_{language}' for language in languages))
+        .order_by('id')
+    )
+    yield XML_HEADER + URLSET_START
+    for variant in variants.iterator(chunk_size=2000):
+        lastmod = variant.datetime_modified.date().isoformat()
+        product = variant.product
+        slugs = {
+            getattr(product, f'slug_{language}') or getattr(product, f'slug_{settings.LANGUAGE_CODE}')
+            for language in languages
+        }
+        yield ''.join(
+            f'<url><loc>{escape(base_url + reverse("products:product-variant-detail", args=(variant.sku, slug)))}'
+            f'</loc><lastmod>{lastmod}</lastmod></url>\n'
+            for slug in sorted(slugs)
+        )
+    yield '</urlset>\n'
+
+
+def get_cached(name, base_url):
+    return cache.get(SITEMAP_KEY.format(base_url, name))
+
+
+def cache_when_sent(chunks, name, base_url):
+    """Pass chunks through and cache joined content after the last one, an interrupted response is not cached"""
+    sent = []
+    for chunk in chunks:
+        sent.append(chunk)
+        yield chunk
+    cache.set(SITEMAP_KEY.format(base_url, name), ''.join(sent), settings.SITEMAP_CACHE_TTL)
@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+
+
+def lock_name(name):
+    """Lock a stored name until the end of current transaction. Storing a file and releasing it take this lock, so
+       a file is never deleted between being found stored and the row referring to it being committed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [name])
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Stores files under the sha256 of their content, e.g. products/ab/ab12...ef.jpg, so identical uploads share a
+       single file and its thumbnails. Files are shared between rows, they have to be deleted with
+       products.thumbnails.release_images only, and rows referring to them saved in the transaction that stores them.
+    """
+
+    def get_hashed_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        digest = sha256.hexdigest()
+        return os.path.join(os.path.dirname(name), digest[:2], digest + os.path.splitext(name)[1].lower())
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_hashed_name(name, content)
+        # lock is held until the row is saved when called in its transaction, see release_images
+        with transaction.atomic():
+            lock_name(name)
+            # same name is same content, a concurrent upload of it that lost the race is stored under another name
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length)
+
+
+product_image_storage = ContentHashStorage()
@@ -0,0 +1,251 @@
+"""In-process prefix index of product, brand and category names used for search-as-you-type suggestions.
+
+Every word start of a name is stored as a key in a sorted list per language, so a prefix is found with bisect and
+suggestions never query database. The index is built in a background thread on first use and again after
+SUGGESTION_INDEX_TTL seconds, so changes made by other processes are picked up too. Requests keep using the current
+index until the new one is swapped in, signals of this process keep it up to date.
+"""
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+PRODUCT = 'product'
+BRAND = 'brand'
+CATEGORY = 'category'
+
+# longer names are cut, so a single entry can not take a lot of memory
+MAX_TEXT_LENGTH = 100
+
+
+def normalize(text):
+    """Lowercase text and unify Arabic and Persian forms of letters that users type interchangeably"""
+    return text.casefold().replace('ي', 'ی').replace('ك', 'ک')
+
+
+def _word_suffixes(text):
+    words = normalize(text).split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class SuggestionIndex:
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.languages = [language for language, _ in settings.LANGUAGES]
+        # sorted (key, kind, id) tuples of each language
+        self.keys = {language: [] for language in self.languages}
+        # (kind, id) -> {language: (text, url)}
+        self.entries = {}
+        # keys are appended unsorted while building and sorted once at the end
+        self.building = False
+        # signals change the index while requests read it
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, kind, id_, texts):
+        """Add or replace an entry, returns False when the index is full"""
+        with self.lock:
+            self.remove(kind, id_)
+            if len(self.entries) >= self.max_entries:
+                return False
+            texts = {language: (text[:MAX_TEXT_LENGTH], url) for language, (text, url) in texts.items() if text}
+            self.entries[(kind, id_)] = texts
+            for language, (text, _url) in texts.items():
+                keys = self.keys[language]
+                for key in _word_suffixes(text):
+                    if self.building:
+                        keys.append((key, kind, id_))
+                    else:
+                        insort(keys, (key, kind, id_))
+            return True
+
+    def remove(self, kind, id_):
+        with self.lock:
+            texts = self.entries.pop((kind, id_), None)
+            if texts is None:
+                return
+            for language, (text, _url) in texts.items():
+                keys = self.keys[language]
+                for key in _word_suffixes(text):
+                    i = bisect_left(keys, (key, kind, id_))
+                    if i < len(keys) and keys[i] == (key, kind, id_):
+                        del keys[i]
+
+    def suggest(self, prefix, language, limit=10):
+        """Return up to limit entries that have a word starting with prefix, as dicts of type, text and url"""
+        prefix = ' '.join(normalize(prefix).split())
+        keys = self.keys.get(language, [])
+        suggestions, seen = [], set()
+        with self.lock:
+            i = bisect_left(keys, (prefix,))
+            while prefix and i < len(keys) and len(suggestions) < limit and keys[i][0].startswith(prefix):
+                _key, kind, id_ = keys[i]
+                if (kind, id_) not in seen:
+                    seen.add((kind, id_))
+                    text, url = self.entries[(kind, id_)][language]
+                    suggestions.append({'type': kind, 'text': text, 'url': url})
+                i += 1
+        return suggestions
+
+    def get_memory_size(self):
+        """Approximate bytes used by keys and entries, strings shared between them are counted once"""
+        counted = set()
+
+        def size(obj):
+            if id(obj) in counted:
+                return 0
+            counted.add(id(obj))
+            if isinstance(obj, (tuple, list)):
+                return sys.getsizeof(obj) + sum(size(item) for item in obj)
+            if isinstance(obj, dict):
+                return sys.getsizeof(obj) + sum(size(key) + size(value) for key, value in obj.items())
+            return sys.getsizeof(obj)
+
+        return size(self.keys) + size(self.entries)
+
+    def get_stats(self):
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'keys': sum(len(keys) for keys in self.keys.values()),
+            'memory_bytes': self.get_memory_size(),
+        }
+
+    def add_product_variant(self, product_variant):
+        """Add product of a default variant, suggestion links to that variant"""
+        product = product_variant.product
+        return self.add(PRODUCT, product.id, {
+            language: (
+                getattr(product, f'name_{language}'),
+                reverse(
+                    'products:product-variant-detail',
+                    args=(product_variant.sku, getattr(product, f'slug_{language}') or product.slug)
+                )
+            ) for language in self.languages
+        })
+
+    def add_product(self, product_id):
+        product_variant = (
+            models.ProductVariant.active_manager.select_related('product')
+            .filter(product_id=product_id, is_default=True).first()
+        )
+        if product_variant is None:
+            self.remove(PRODUCT, product_id)
+        else:
+            self.add_product_variant(product_variant)
+
+    def add_brand(self, brand):
+        """Add brand, there is no brand page so suggestion links to search results of its name"""
+        search_url = reverse('products:search')
+        texts = {}
+        for language in self.languages:
+            name = getattr(brand, f'name_{language}') or ''
+            texts[language] = (name, f"{search_url}?{urlencode({'q': name})}")
+        self.add(BRAND, brand.id, texts)
+
+    def add_category(self, category):
+        if not category.effective_is_active:
+            self.remove(CATEGORY, category.id)
+            return
+        self.add(CATEGORY, category.id, {
+            language: (
+                getattr(category, f'name_{language}'),
+                reverse('products:category-list', args=(getattr(category, f'slug_{language}') or category.slug,))
+            ) for language in self.languages
+        })
+
+    def add_categories(self, category_ids):
+        """Add or remove given categories and their products, after their inherited activation is changed"""
+        for category in models.ProductCategory.objects.filter(pk__in=category_ids):
+            self.add_category(category)
+        product_ids = set(models.Product.objects.filter(category_id__in=category_ids).values_list('id', flat=True))
+        product_variants = models.ProductVariant.active_manager.select_related('product').filter(
+            product_id__in=product_ids, is_default=True
+        )
+        for product_variant in product_variants:
+            product_ids.discard(product_variant.product_id)
+            self.add_product_variant(product_variant)
+        for product_id in product_ids:
+            self.remove(PRODUCT, product_id)
+
+    def build(self):
+        """Fill an empty index from database, categories and brands first since they are fewer and more general.
+           Keys are sorted once at the end, inserting each of them in order would take quadratic time.
+        """
+        self.building = True
+        for category in models.ProductCategory.active_manager.all():
+            self.add_category(category)
+        for brand in models.Brand.objects.all():
+            self.add_brand(brand)
+        product_fields = [f'product__{field}_{language}' for field in ('name', 'slug') for language in self.languages]
+        product_variants = (
+            models.ProductVariant.active_manager.select_related('product').filter(is_default=True)
+            .only('sku', 'product', *product_fields)
+        )
+        for product_variant in product_variants.iterator(chunk_size=2000):
+            if not self.add_product_variant(product_variant):
+                break
+        for keys in self.keys.values():
+            keys.sort()
+        self.building = False
+        return self
+
+
+_index = None
+_index_built_at = 0
+# updates made while a new index is built, replayed on it before it's swapped in, None when no build is running
+_pending_updates = None
+_lock = threading.Lock()
+
+
+def _build_index():
+    global _index, _index_built_at, _pending_updates
+    try:
+        index = SuggestionIndex(settings.SUGGESTION_INDEX_MAX_ENTRIES).build()
+        with _lock:
+            for update in _pending_updates:
+                update(index)
+            _index, _index_built_at = index, time.monotonic()
+    except Exception:
+        logger.exception('Building suggestion index failed')
+    finally:
+        with _lock:
+            _pending_updates = None
+        # thread has its own database connection
+        connection.close()
+
+
+def get_suggestion_index():
+    """Return index of this process. When it's missing or older than SUGGESTION_INDEX_TTL a new one is built in a
+       background thread, meanwhile the current one (or an empty one before the first build) is returned.
+    """
+    global _pending_updates
+    with _lock:
+        expired = _index is None or time.monotonic() - _index_built_at > settings.SUGGESTION_INDEX_TTL
+        if expired and _pending_updates is None:
+            _pending_updates = []
+            threading.Thread(target=_build_index, daemon=True).start()
+        return _index if _index is not None else SuggestionIndex(0)
+
+
+def apply_update(update):
+    """Apply update(index) to index of this process, and to the index being built so it's not lost on swap"""
+    with _lock:
+        if _pending_updates is not None:
+            _pending_updates.append(update)
+        index = _index
+    if index is not None:
+        update(index)
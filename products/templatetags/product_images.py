@@ -0,0 +1,43 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def resolve_thumbnails(items, field_name, size):
+    """Pairs of (item, thumbnail) of items that have an image in field_name, thumbnails of all items are looked up
+       together, e.g. {% resolve_thumbnails images 'image' 'large' as gallery_images %}
+    """
+    items = [item for item in items if getattr(item, field_name)]
+    return list(zip(items, thumbnails.resolve_thumbnails([getattr(item, field_name) for item in items], size)))
+
+
+@register.simple_tag
+def product_picture(image, thumbnail, size, width=None, height=None, color='', placeholder='', **attrs):
+    """<picture> offering every derivative of a resolved thumbnail, or the original image while its thumbnails are
+       generated. Stored dimensions of the original and its placeholder keep the layout until the image arrives, e.g.
+       {% product_picture image.image thumbnail 'large' width=image.width height=image.height
+          color=image.dominant_color placeholder=image.placeholder alt=image.alt_text sizes='50vw' %}
+    """
+    sizes = attrs.pop('sizes', None)
+    if color:
+        attrs['style'] = f'background: {color} url("{placeholder}") center / cover no-repeat'
+    if thumbnail.name == image.name:
+        return format_html('<img src="{}"{}>', thumbnail.url, flatatt({'width': width, 'height': height, **attrs}))
+    sources, img_srcset = [], ''
+    for mime_type, srcset in thumbnails.get_srcsets(image, size):
+        if mime_type is None:
+            img_srcset = srcset
+        else:
+            sources.append((mime_type, srcset, flatatt({'sizes': sizes})))
+    # size of a resolved thumbnail is read from its kvstore record, its derivatives have the same aspect ratio
+    return format_html(
+        '<picture>{}<img src="{}"{}></picture>',
+        format_html_join('', '<source type="{}" srcset="{}"{}>', sources),
+        thumbnail.url,
+        flatatt({'srcset': img_srcset, 'sizes': sizes, 'width': thumbnail.width, 'height': thumbnail.height, **attrs})
+    )
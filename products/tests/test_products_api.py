@@ -0,0 +1,31 @@
+from django.test import SimpleTestCase
+
+from ..api import parse_fields, make_etag, CatalogApiView
+
+
+class TestParseFields(SimpleTestCase):
+    available = {'id': None, 'sku': None, 'name': None}
+
+    def test_all_fields_by_default(self):
+        self.assertEqual(parse_fields('', self.available), ['id', 'sku', 'name'])
+
+    def test_requested_fields_keep_their_order(self):
+        self.assertEqual(parse_fields('name, sku,,name', self.available), ['name', 'sku'])
+
+    def test_unknown_fields(self):
+        with self.assertRaisesMessage(ValueError, 'price, stock'):
+            parse_fields('sku,price,stock', self.available)
+
+    def test_etag_depends_on_parts(self):
+        self.assertEqual(make_etag('en', 'sku', 1), make_etag('en', 'sku', 1))
+        self.assertNotEqual(make_etag('en', 'sku', 1), make_etag('fa', 'sku', 1))
+
+
+class TestCatalogApiView(SimpleTestCase):
+
+    def test_subclasses_implement_state_and_data(self):
+        class StateOnlyApiView(CatalogApiView):
+            def get_state(self):
+                return None, ()
+        with self.assertRaises(TypeError):
+            StateOnlyApiView()
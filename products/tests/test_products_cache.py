@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import (
+    strip_csrf_token, insert_csrf_token, CSRF_TOKEN_PLACEHOLDER, get_listing_version, invalidate_variant_pages,
+    bump_catalog_version
+)
+
+
+class TestVariantPageCsrfToken(SimpleTestCase):
+    rendered_form = '<form><input type="hidden" name="csrfmiddlewaretoken" value="a1b2c3"></form>'
+
+    def test_strip_csrf_token(self):
+        content = strip_csrf_token(self.rendered_form)
+        self.assertNotIn('a1b2c3', content)
+        self.assertIn(CSRF_TOKEN_PLACEHOLDER, content)
+
+    def test_insert_csrf_token(self):
+        content = insert_csrf_token(strip_csrf_token(self.rendered_form), 'x9y8z7')
+        self.assertEqual(content, self.rendered_form.replace('a1b2c3', 'x9y8z7'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestListingVersion(SimpleTestCase):
+
+    def test_dropping_pages_bumps_listing_version(self):
+        version = get_listing_version()
+        self.assertEqual(get_listing_version(), version)
+        invalidate_variant_pages(['123'])
+        self.assertNotEqual(get_listing_version(), version)
+        version = get_listing_version()
+        bump_catalog_version()
+        self.assertNotEqual(get_listing_version(), version)
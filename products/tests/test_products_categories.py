@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from .. import models
+from ..categories import CategoryTree
+from ..models import ProductCategory, CategoryFacet
+
+
+class TestCategoryTree(SimpleTestCase):
+
+    def setUp(self):
+        self.tree = CategoryTree([
+            ProductCategory(id=1, name_en='Digital', slug_en='digital', path='/1/'),
+            ProductCategory(id=2, parent_id=1, name_en='Laptop', slug_en='laptop', path='/1/2/'),
+            ProductCategory(id=3, parent_id=2, name_en='Gaming', slug_en='gaming', path='/1/2/3/'),
+        ], timezone.now())
+
+    def test_get_ancestors(self):
+        self.assertEqual([node.id for node in self.tree.get_ancestors(3)], [1, 2, 3])
+        self.assertEqual(self.tree.get_ancestors(4), [])
+
+    def test_children(self):
+        self.assertEqual([node.id for node in self.tree.roots], [1])
+        self.assertEqual([node.id for node in self.tree.nodes[1].children], [2])
+
+    def test_path_ancestor_ids(self):
+        self.assertEqual(ProductCategory(path='/1/2/3/').get_ancestor_ids(), [1, 2, 3])
+
+
+class TestStaleFacets(SimpleTestCase):
+
+    def test_stale_categories_are_rebuilt_once(self):
+        connection = mock.Mock(spop=mock.Mock(side_effect=[[b'3', b'1'], [b'2'], []]))
+        with mock.patch.object(models, 'get_redis_connection', return_value=connection), \
+                mock.patch.object(CategoryFacet.objects, 'rebuild') as rebuild:
+            CategoryFacet.objects.mark_stale([1, 3])
+            CategoryFacet.objects.mark_stale([])
+            self.assertEqual(CategoryFacet.objects.rebuild_stale(), 3)
+        connection.sadd.assert_called_once_with(CategoryFacet.objects.STALE_KEY, 1, 3)
+        self.assertEqual([call.args for call in rebuild.call_args_list], [(1,), (3,), (2,)])
@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import filter_bitmaps
+from ..filter_bitmaps import encode, decode, update_variants, MEMBERSHIPS_KEY
+
+
+class TestFilterBitmaps(SimpleTestCase):
+
+    def test_encode(self):
+        # bit 0 is the most significant bit of the first byte, like SETBIT
+        self.assertEqual(encode([0, 9]), bytes([0b10000000, 0b01000000]))
+        self.assertEqual(encode([]), b'')
+
+    def test_decode(self):
+        self.assertEqual(decode(encode([3, 8, 17, 1000])), [1000, 17, 8, 3])
+        self.assertEqual(decode(b'\x00\x00'), [])
+
+
+class TestUpdateVariants(SimpleTestCase):
+
+    def test_every_bitmap_is_passed_as_a_key(self):
+        connection = mock.MagicMock()
+        connection.hmget.side_effect = [[b'products:bitmap:brand:1', None], [b'products:bitmap:brand:3']]
+        pipe = connection.pipeline.return_value.__enter__.return_value
+        # variant 2 is changed concurrently, so it's tried again with its new memberships
+        pipe.execute.side_effect = [[1, 0], [1]]
+        script = connection.register_script.return_value
+        memberships = {1: ['products:bitmap:brand:2'], 2: ['products:bitmap:color:1']}
+        with mock.patch.object(filter_bitmaps, 'get_redis_connection', return_value=connection), \
+                mock.patch.object(filter_bitmaps, '_get_memberships', return_value=memberships):
+            update_variants([1, 2])
+        self.assertEqual([call.kwargs['keys'] for call in script.call_args_list], [
+            [MEMBERSHIPS_KEY, 'products:bitmap:brand:1', 'products:bitmap:brand:2'],
+            [MEMBERSHIPS_KEY, 'products:bitmap:color:1'],
+            [MEMBERSHIPS_KEY, 'products:bitmap:brand:3', 'products:bitmap:color:1'],
+        ])
+        self.assertEqual(script.call_args_list[0].kwargs['args'], [1, 1, 'products:bitmap:brand:1'])
+        self.assertEqual(script.call_args_list[1].kwargs['args'], [2, 0, ''])
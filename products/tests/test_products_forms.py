@@ -0,0 +1,15 @@
+from django.http import QueryDict
+from django.test import SimpleTestCase
+
+from ..forms import CategoryFilterForm
+
+
+class TestCategoryFilterForm(SimpleTestCase):
+
+    def test_get_filters(self):
+        form = CategoryFilterForm(QueryDict('brand=1&brand=3&color=&min_price=1000'))
+        self.assertEqual(form.get_filters(), {'brand': [1, 3], 'min_price': 1000})
+
+    def test_invalid_filters_are_ignored(self):
+        form = CategoryFilterForm(QueryDict('brand=x&color=-2&attribute_value=4&max_price=-1'))
+        self.assertEqual(form.get_filters(), {'attribute_value': [4]})
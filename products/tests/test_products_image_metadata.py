@@ -0,0 +1,38 @@
+import io
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+from ..image_metadata import get_image_metadata, update_image_metadata
+
+
+def make_image(size=(120, 80), format_='JPEG'):
+    image = Image.new('RGB', size, (200, 30, 30))
+    image.paste((10, 10, 240), (0, 0, 20, 20))
+    content = io.BytesIO()
+    image.save(content, format_)
+    return ContentFile(content.getvalue(), name=f'image.{format_.lower()}')
+
+
+class TestImageMetadata(SimpleTestCase):
+
+    def test_get_image_metadata(self):
+        width, height, color, placeholder = get_image_metadata(make_image())
+        self.assertEqual((width, height), (120, 80))
+        red, green, blue = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertTrue(red > 150 and green < 80 and blue < 80)
+        self.assertTrue(placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(placeholder), 1000)
+
+    def test_update_image_metadata_of_new_upload(self):
+        class Instance:
+            pass
+        instance = Instance()
+        instance.image = upload = make_image(format_='PNG')
+        upload._committed = False
+        instance.width = None
+        update_image_metadata(instance, 'image', ('width', 'height', 'color', 'placeholder'))
+        self.assertEqual((instance.width, instance.height), (120, 80))
+        # upload is rewound so storage saves all of it
+        self.assertEqual(upload.tell(), 0)
@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from ..promotions import ActivePromotions
+
+
+class TestActivePromotions(SimpleTestCase):
+
+    def test_snapshot_is_true_while_a_promotion_is_active(self):
+        now = timezone.now()
+        self.assertTrue(ActivePromotions(True, now + timedelta(hours=1), now + timedelta(seconds=30)))
+        self.assertFalse(ActivePromotions(False, None, now))
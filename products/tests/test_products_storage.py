@@ -0,0 +1,25 @@
+import hashlib
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from ..storage import ContentHashStorage
+
+
+class TestContentHashStorage(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = ContentHashStorage(location=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_identical_uploads_share_a_file(self):
+        name = self.storage.save('products/front.JPG', ContentFile(b'image'))
+        digest = hashlib.sha256(b'image').hexdigest()
+        self.assertEqual(name, f'products/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(self.storage.save('products/copy.jpg', ContentFile(b'image')), name)
+        self.assertNotEqual(self.storage.save('products/other.jpg', ContentFile(b'other image')), name)
+        self.assertEqual(self.storage.open(name).read(), b'image')
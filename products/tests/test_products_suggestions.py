@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import suggestions
+from ..suggestions import SuggestionIndex, PRODUCT, BRAND
+
+
+class TestSuggestionIndex(SimpleTestCase):
+
+    def setUp(self):
+        self.index = SuggestionIndex(max_entries=2)
+        self.index.add(PRODUCT, 1, {'en': ('Apple iPhone 11', '/p/1/'), 'fa': ('گوشی اپل آیفون 11', '/p/1/')})
+        self.index.add(BRAND, 1, {'en': ('Apple', '/s/apple/'), 'fa': ('اپل', '/s/apple/')})
+
+    def test_suggest_by_word_prefix(self):
+        self.assertEqual(
+            [suggestion['text'] for suggestion in self.index.suggest('ap', 'en')], ['Apple', 'Apple iPhone 11']
+        )
+        self.assertEqual(self.index.suggest('IPHO', 'en')[0]['url'], '/p/1/')
+        self.assertEqual(len(self.index.suggest('آیفون', 'fa')), 1)
+
+    def test_remove(self):
+        self.index.remove(PRODUCT, 1)
+        self.assertEqual([suggestion['type'] for suggestion in self.index.suggest('ap', 'en')], [BRAND])
+        self.assertEqual(self.index.suggest('iphone', 'en'), [])
+
+    def test_max_entries(self):
+        self.assertFalse(self.index.add(PRODUCT, 2, {'en': ('Galaxy S21', '/p/2/')}))
+        self.assertTrue(self.index.add(PRODUCT, 1, {'en': ('Apple iPhone 12', '/p/1/')}))
+        self.assertEqual(len(self.index), 2)
+
+    def test_keys_added_while_building_are_sorted_once(self):
+        index = SuggestionIndex(max_entries=10)
+        index.building = True
+        index.add(PRODUCT, 2, {'en': ('Galaxy S21', '/p/2/')})
+        index.add(BRAND, 2, {'en': ('Apple', '/s/apple/')})
+        index.keys['en'].sort()
+        index.building = False
+        index.add(PRODUCT, 1, {'en': ('Apple iPhone 11', '/p/1/')})
+        self.assertEqual(index.keys['en'], sorted(index.keys['en']))
+        self.assertEqual(len(index.suggest('ap', 'en')), 2)
+
+
+class TestGetSuggestionIndex(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(suggestions, _index=None, _index_built_at=0, _pending_updates=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requests_use_current_index_while_new_one_is_built(self):
+        with mock.patch.object(suggestions.threading, 'Thread') as thread:
+            self.assertEqual(len(suggestions.get_suggestion_index()), 0)
+            suggestions.get_suggestion_index()
+        # only one build is started, updates made meanwhile are replayed on the new index
+        self.assertEqual(thread.call_count, 1)
+        suggestions.apply_update(lambda index: index.add(BRAND, 1, {'en': ('Apple', '/s/apple/')}))
+
+        def build(index):
+            index.add(PRODUCT, 1, {'en': ('Apple iPhone 11', '/p/1/')})
+            return index
+        with mock.patch.object(SuggestionIndex, 'build', build):
+            thread.call_args.kwargs['target']()
+        self.assertEqual(len(suggestions.get_suggestion_index().suggest('ap', 'en')), 2)
@@ -0,0 +1,155 @@
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile, serialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+from .. import thumbnails
+from ..models import ProductCategory, Brand, Color, ProductType, Product, ProductVariant, ProductImage
+from ..storage import product_image_storage
+from .test_products_image_metadata import make_image
+from ..thumbnails import get_thumbnail_name, resolve_thumbnails, get_derivatives, get_srcsets, release_images
+
+
+class TestThumbnailName(SimpleTestCase):
+
+    def test_name_matches_sorl(self):
+        """Pre-computed name must be the one sorl creates, a cached kvstore record makes sorl return it untouched"""
+        kvstore = mock.Mock(get=lambda thumbnail: thumbnail)
+        with mock.patch.object(default, 'kvstore', kvstore):
+            for name in ('products/photo.jpg', 'products/photo.png'):
+                self.assertEqual(
+                    get_thumbnail_name(name, '800x800', crop='center'),
+                    get_thumbnail(name, '800x800', crop='center').name
+                )
+
+
+class DictKVStore(KVStoreBase):
+    """kvstore keeping records in a dict, its keys are the ones sorl stores in Redis"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = {}
+
+    def _get_raw(self, key):
+        return self.records.get(key)
+
+    def _set_raw(self, key, value):
+        self.records[key] = value
+
+    def _delete_raw(self, *keys):
+        for key in keys:
+            self.records.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        return [key for key in self.records if key.startswith(prefix)]
+
+
+class TestThumbnailKey(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=directory.name))
+        self.enterContext(mock.patch.object(default, 'kvstore', DictKVStore()))
+
+    def test_thumbnail_created_by_sorl_is_resolved(self):
+        name = default_storage.save('products/photo.jpg', make_image())
+        geometry_string, options = settings.PRODUCT_IMAGE_SIZES['large']
+        thumbnail = get_thumbnail(name, geometry_string, **options)
+        with mock.patch.object(thumbnails, 'queue_thumbnails') as queue:
+            [resolved] = resolve_thumbnails([ImageFile(name)], 'large')
+        queue.assert_not_called()
+        self.assertEqual((resolved.name, resolved.size), (thumbnail.name, thumbnail.size))
+
+
+class TestResolveThumbnails(SimpleTestCase):
+
+    def test_missing_thumbnails_are_queued(self):
+        generated = ImageFile(get_thumbnail_name('products/a.jpg', '800x800', crop='center'))
+        generated.set_size((800, 800))
+        records = {add_prefix(generated.key): serialize_image_file(generated)}
+        kvstore = mock.Mock(spec=['_get_raw'], _get_raw=records.get)
+        files = [ImageFile('products/a.jpg'), ImageFile('products/b.jpg')]
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with mock.patch.object(default, 'kvstore', kvstore), mock.patch.object(thumbnails, 'queue_thumbnails') as queue:
+            with override_settings(CACHES=locmem):
+                resolved = resolve_thumbnails(files, 'large')
+                # already queued by the previous render
+                resolve_thumbnails(files, 'large')
+        self.assertEqual([image.name for image in resolved], [generated.name, 'products/b.jpg'])
+        self.assertEqual(resolved[0].size, [800, 800])
+        queue.assert_called_once_with(['products/b.jpg'])
+
+
+@override_settings(
+    PRODUCT_IMAGE_SIZES={'large': ('800x600', {'crop': 'center'})}, PRODUCT_IMAGE_SRCSET_WIDTHS=(200, 400, 1000),
+    PRODUCT_IMAGE_FORMATS=('WEBP', 'UNKNOWN')
+)
+class TestDerivatives(SimpleTestCase):
+
+    def test_derivatives(self):
+        self.assertEqual(get_derivatives('large'), [
+            ('WEBP', 200, '200x150', {'crop': 'center', 'format': 'WEBP'}),
+            ('WEBP', 400, '400x300', {'crop': 'center', 'format': 'WEBP'}),
+            ('WEBP', 800, '800x600', {'crop': 'center', 'format': 'WEBP'}),
+            (None, 200, '200x150', {'crop': 'center'}),
+            (None, 400, '400x300', {'crop': 'center'}),
+            (None, 800, '800x600', {'crop': 'center'}),
+        ])
+
+    def test_srcsets(self):
+        srcsets = get_srcsets('products/a.jpg', 'large')
+        self.assertEqual([mime_type for mime_type, _srcset in srcsets], ['image/webp', None])
+        self.assertIn('.webp 200w', srcsets[0][1])
+        self.assertTrue(srcsets[1][1].endswith(
+            f"{default.storage.url(get_thumbnail_name('products/a.jpg', '800x600', crop='center'))} 800w"
+        ))
+
+
+class TestReleaseImages(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ProductCategory.objects.create(name='graphic cards', slug='graphic-cards')
+        Brand.objects.create(name='Asus')
+        Color.objects.create(name='red', color='#ff0000')
+        ProductType.objects.create(name='gpu')
+        Product.objects.create(name='RTX 4090', slug='rtx-4090', description='lorem ...', category_id=1)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=directory.name))
+        self.enterContext(mock.patch.object(default, 'kvstore'))
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        variant = ProductVariant.objects.create(
+            sku='123', is_default=True, retail_price_toman='123000', store_price_toman='125000',
+            retail_price_dollar=22.5, store_price_dollar=24.00, weight=3.2, product_id=1, product_type_id=1,
+            brand_id=1, color_id=1, thumbnail_image=ContentFile(b'image', 'front.jpg')
+        )
+        image = ProductImage.objects.create(
+            product_variant=variant, image=ContentFile(b'image', 'copy.jpg'), alt_text='RTX 4090'
+        )
+        name = variant.thumbnail_image.name
+        self.assertEqual(image.image.name, name)
+
+        image.delete()
+        release_images([name])
+        self.assertTrue(product_image_storage.exists(name))
+
+        variant.thumbnail_image = ContentFile(b'other image', 'back.jpg')
+        variant.save()
+        release_images([name])
+        self.assertFalse(product_image_storage.exists(name))
+        # same upload is stored again once released
+        variant.thumbnail_image = ContentFile(b'image', 'front.jpg')
+        variant.save()
+        self.assertTrue(product_image_storage.exists(name))
@@ -0,0 +1,192 @@
+"""Thumbnails of product images, generated ahead of time in a process pool.
+
+Saving a variant thumbnail or a product image queues every size of PRODUCT_IMAGE_SIZES after commit. Templates and
+home sections never resize an image while rendering: resolve_thumbnails reads kvstore records of all their images at
+once and falls back to the original image of a thumbnail that is not generated yet. sorl names a thumbnail only from
+its source name, geometry and options, so srcset urls of derivatives are computed without kvstore.
+
+Every size also has derivatives for srcset: smaller PRODUCT_IMAGE_SRCSET_WIDTHS and each of them again in the modern
+formats of PRODUCT_IMAGE_FORMATS. They are generated before the size itself, so once a thumbnail is resolved all of
+its derivatives exist too.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail, delete
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import settings as thumbnail_settings, defaults as thumbnail_defaults
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .cache import invalidate_variants
+from .models import ProductVariant, ProductImage
+from .storage import product_image_storage, lock_name
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_QUEUED_KEY = 'thumbnails:queued:{}'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_thumbnail_name(file_, geometry_string, **options):
+    """Name sorl gives to the thumbnail, options are completed the same way ThumbnailBackend.get_thumbnail does.
+       It has no method of its own for that, so this follows sorl-thumbnail 12.10 pinned in requirements.txt; tests
+       check names and kvstore keys against thumbnails sorl really creates.
+    """
+    backend = default.backend
+    source = ImageFile(file_)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry_string, options)
+
+
+def _get_records(keys):
+    kvstore = default.kvstore
+    # Redis kvstore reads all records with a single MGET, other kvstores one by one
+    if hasattr(kvstore, 'connection'):
+        return kvstore.connection.mget(keys) if keys else []
+    return [kvstore._get_raw(key) for key in keys]
+
+
+def resolve_thumbnails(files, size):
+    """Return thumbnails of a size of PRODUCT_IMAGE_SIZES for given image files in the same order, with one kvstore
+       round trip. Images whose thumbnail is not generated yet are resolved to themselves and queued, unless a render
+       of any process queued them in the last THUMBNAIL_QUEUED_TTL seconds.
+    """
+    geometry_string, options = settings.PRODUCT_IMAGE_SIZES[size]
+    thumbnails = [
+        ImageFile(get_thumbnail_name(file_, geometry_string, **options), default.storage) for file_ in files
+    ]
+    records = _get_records([add_prefix(thumbnail.key) for thumbnail in thumbnails])
+    resolved, missing = [], []
+    for file_, record in zip(files, records):
+        if record is None:
+            missing.append(file_.name)
+            resolved.append(ImageFile(file_))
+        else:
+            resolved.append(deserialize_image_file(record))
+    missing = [
+        name for name in missing
+        if cache.add(THUMBNAIL_QUEUED_KEY.format(name), 1, settings.THUMBNAIL_QUEUED_TTL)
+    ]
+    if missing:
+        queue_thumbnails(missing)
+    return resolved
+
+
+def get_formats():
+    """Formats of PRODUCT_IMAGE_FORMATS this install can write, Pillow needs an encoder and sorl a file extension"""
+    Image.init()
+    return [format_ for format_ in settings.PRODUCT_IMAGE_FORMATS if format_ in Image.SAVE and format_ in EXTENSIONS]
+
+
+def get_derivatives(size):
+    """Return (format, width, geometry string, options) of every derivative of a size given as WxH or W, format is None
+       for format of the original image. The size itself comes last.
+    """
+    geometry_string, options = settings.PRODUCT_IMAGE_SIZES[size]
+    width, _, height = geometry_string.partition('x')
+    width = int(width)
+    widths = [srcset_width for srcset_width in settings.PRODUCT_IMAGE_SRCSET_WIDTHS if srcset_width < width] + [width]
+    return [
+        (
+            format_, srcset_width,
+            f'{srcset_width}x{round(int(height) * srcset_width / width)}' if height else str(srcset_width),
+            dict(options, format=format_) if format_ else options
+        )
+        for format_ in [*get_formats(), None] for srcset_width in widths
+    ]
+
+
+def get_srcsets(file_, size):
+    """Return [(mime type, srcset)] of derivatives of an image, mime type is None for format of the original image"""
+    srcsets = {}
+    for format_, width, geometry_string, options in get_derivatives(size):
+        url = default.storage.url(get_thumbnail_name(file_, geometry_string, **options))
+        srcsets.setdefault(format_ and f'image/{format_.lower()}', []).append(f'{url} {width}w')
+    return [(mime_type, ', '.join(candidates)) for mime_type, candidates in srcsets.items()]
+
+
+def generate_thumbnails(names):
+    """Create every derivative of given images that does not exist yet, runs in worker processes. Cached pages and
+       fragments of variants showing these images are dropped, they may have been rendered with the originals.
+    """
+    for name in names:
+        source = ImageFile(name, product_image_storage)
+        for size in settings.PRODUCT_IMAGE_SIZES:
+            for _format, _width, geometry_string, options in get_derivatives(size):
+                get_thumbnail(source, geometry_string, **options)
+    invalidate_variants(
+        ProductVariant.objects.filter(Q(thumbnail_image__in=names) | Q(images__image__in=names))
+        .values_list('id', 'sku').distinct()
+    )
+    return len(names)
+
+
+def get_executor():
+    """Process pool of this process, workers are spawned rather than forked so no database or Redis connection of
+       the parent is shared with them
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                settings.THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+            )
+    return _executor
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error('Generating thumbnails failed', exc_info=future.exception())
+
+
+def queue_thumbnails(names):
+    get_executor().submit(generate_thumbnails, list(names)).add_done_callback(_log_failure)
+
+
+def release_images(names):
+    """Delete stored images with their thumbnails once no variant or product image refers to them. Identical uploads
+       share a file, so the number of rows referring to a file is its reference count.
+    """
+    for name in set(filter(None, names)):
+        # a concurrent save of the same file waits for the lock, then finds it deleted and stores it again
+        with transaction.atomic():
+            lock_name(name)
+            referred = (
+                ProductVariant.objects.filter(thumbnail_image=name).exists()
+                or ProductImage.objects.filter(image=name).exists()
+            )
+            if not referred:
+                delete(ImageFile(name, product_image_storage))
+
+
+def image_saved(instance, field_name):
+    """After commit, queue thumbnails of an image field that holds another file than the one loaded or saved before,
+       and release the previous file
+    """
+    name = getattr(instance, field_name).name
+    previous_name = getattr(instance, f'_db_{field_name}', None)
+    if name != previous_name:
+        if name:
+            transaction.on_commit(lambda: queue_thumbnails([name]))
+        if previous_name:
+            transaction.on_commit(lambda: release_images([previous_name]))
+    setattr(instance, f'_db_{field_name}', name)
@@ -1,9 +1,20 @@
 from django.urls import path
 
-from . import views
+from . import views, api
 
 app_name = 'products'
 
 urlpatterns = [
+    # kept before variant detail, otherwise their first part would be taken as a sku
+    path('category/<slug:category_slug>/', views.ProductCategoryListView.as_view(), name='category-list'),
+    path('search/', views.ProductSearchView.as_view(), name='search'),
+    path('search/suggestions/', views.ProductSuggestionView.as_view(), name='search-suggestions'),
+    path('api/categories/', api.CategoryApiView.as_view(), name='api-categories'),
+    path(
+        'api/categories/<slug:category_slug>/variants/', api.CategoryVariantsApiView.as_view(),
+        name='api-category-variants'
+    ),
+    path('api/products/<int:product_id>/', api.ProductApiView.as_view(), name='api-product'),
+    path('api/variants/<str:sku>/', api.ProductVariantApiView.as_view(), name='api-product-variant'),
     path('<str:sku>/<slug:product_slug>/', views.ProductVariantDetailView.as_view(), name='product-variant-detail'),
 ]
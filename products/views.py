@@ -1,15 +1,30 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponseRedirect
-from django.views.generic import DetailView
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.views.generic import DetailView, ListView, View
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
 
 from comments.views import ProductCommentPartial
-from .queries import product_detail_info
-from .models import ProductPromotion
+from comments.pagination import CountedPaginator
+from .models import ProductVariant, ProductCategory, CategoryFacet, Brand, Color, ProductAttributeValue
+from .forms import CategoryFilterForm, ListingSortForm
+from .queries import (
+    product_detail_info, category_variants_list, search_variants, group_attribute_values, sort_variants,
+    VariantIdsList
+)
+from . import filter_bitmaps, sitemaps
+from .cache import get_variant_page, set_variant_page, strip_csrf_token, insert_csrf_token, get_variant_version
+from .promotions import get_price_cache_ttl, get_active_promotions
+from .suggestions import get_suggestion_index
+from .categories import get_category_tree
 
 
 class ProductVariantDetailView(DetailView):
     template_name = 'products/product-detail.html'
     context_object_name = 'product_variant'
+    cache_page = True
 
     def get_queryset(self):
         return product_detail_info()
@@ -18,21 +33,33 @@ class ProductVariantDetailView(DetailView):
         return get_object_or_404(self.get_queryset(), sku=self.kwargs.get('sku'))
 
     def get(self, request, *args, **kwargs):
+        page_cacheable = self.is_page_cacheable()
+        if page_cacheable and (content := get_variant_page(self.kwargs.get('sku'), get_language())) is not None:
+            return HttpResponse(insert_csrf_token(content, get_token(request)))
+
         self.object = self.get_object()
-        comments_partial_response = ProductCommentPartial.as_view(product_variant=self.object)(request)
+        comments_partial_response = ProductCommentPartial.as_view(
+            product_variant=self.object, cursor_pagination=True
+        )(request)
         if isinstance(comments_partial_response, HttpResponseRedirect):
             return comments_partial_response
-        return self.render_to_response(
+        response = self.render_to_response(
             self.get_context_data(
                 object=self.object,
                 comments_partial=comments_partial_response.rendered_content,
                 active_tab=self.get_active_tab(comments_partial_response)
             )
         )
+        if page_cacheable:
+            response.add_post_render_callback(self.cache_rendered_page)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['promotions_available'] = ProductPromotion.active_manager.exists()
+        context['promotions_available'] = bool(get_active_promotions())
+        context['fragment_version'] = get_variant_version(self.object.id)
+        context['fragment_cache_ttl'] = settings.CACHE_TTL
+        context['breadcrumb'] = get_category_tree().get_ancestors(self.object.product.category_id)
         return context
 
     def post(self, request, *args, **kwargs):
@@ -40,6 +67,182 @@ class ProductVariantDetailView(DetailView):
 
     def get_active_tab(self, comments_partial):
         """get which tab should be active when template renders"""
-        if 'page' in self.request.GET or comments_partial.context_data['form'].errors:
+        pagination_kwargs = (ProductCommentPartial.page_kwarg, ProductCommentPartial.cursor_kwarg)
+        paginated = any(kwarg in self.request.GET for kwarg in pagination_kwargs)
+        if paginated or comments_partial.context_data['form'].errors:
             return 'comments'
         return 'review'
+
+    def is_page_cacheable(self):
+        """Only plain GET requests of visitors without session (so anonymous) and pending messages are cached,
+           anything else may render content that belongs to a single visitor.
+        """
+        request = self.request
+        return (
+            self.cache_page and request.method == 'GET' and not request.GET
+            and request.session.is_empty() and not get_messages(request)
+        )
+
+    def cache_rendered_page(self, response):
+        if response.status_code == 200:
+            set_variant_page(
+                self.kwargs.get('sku'), get_language(), strip_csrf_token(response.content.decode()),
+                get_price_cache_ttl()
+            )
+
+
+class ProductVariantListMixin:
+    """Shared by variant listings, pagination and sort links keep the other query parameters"""
+    context_object_name = 'product_variants'
+    paginate_by = 24
+    sort = None
+
+    def get_price_field(self):
+        return 'price_toman' if get_language() == 'fa' else 'price_dollar'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        query.pop(self.page_kwarg, None)
+        context['filter_query'] = query.urlencode()
+        query.pop('sort', None)
+        context.update(sort_query=query.urlencode(), sort=self.sort, sort_choices=ListingSortForm.SORT_CHOICES)
+        return context
+
+
+class ProductCategoryListView(ProductVariantListMixin, ListView):
+    template_name = 'products/category-list.html'
+
+    def get(self, request, *args, **kwargs):
+        self.category = get_object_or_404(ProductCategory.active_manager, slug=self.kwargs.get('category_slug'))
+        self.filters = CategoryFilterForm(request.GET).get_filters()
+        self.sort = ListingSortForm(request.GET).get_sort()
+        self.facet_counts = CategoryFacet.objects.get_counts(self.category.id)
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # bitmaps give newest first ids only, prices change with promotions and are not in bitmaps, price filters
+        # and other sorts are left to database
+        bitmap_filters = 'min_price' not in self.filters and 'max_price' not in self.filters
+        if self.filters and bitmap_filters and self.sort == ListingSortForm.SORT_NEWEST:
+            variant_ids = filter_bitmaps.filter_variant_ids(self.category.id, self.get_bitmap_groups())
+            if variant_ids is not None:
+                return VariantIdsList(variant_ids)
+        return category_variants_list(self.category, self.filters, self.sort, self.get_price_field())
+
+    def get_bitmap_groups(self):
+        groups = [
+            [(kind, id_) for id_ in self.filters[name]]
+            for name, kind in (('brand', filter_bitmaps.BRAND), ('color', filter_bitmaps.COLOR))
+            if name in self.filters
+        ]
+        if 'attribute_value' in self.filters:
+            attribute_values = group_attribute_values(self.filters['attribute_value']) or [[]]
+            groups.extend(
+                [(filter_bitmaps.ATTRIBUTE_VALUE, id_) for id_ in value_ids] for value_ids in attribute_values
+            )
+        return groups
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if self.filters:
+            return super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        # every variant has exactly one brand, so count of an unfiltered category is sum of its brand facets
+        count = sum(self.facet_counts[CategoryFacet.FACET_BRAND].values())
+        return CountedPaginator(queryset, per_page, count, orphans=orphans, **kwargs)
+
+    def get_facets(self):
+        """Return (name, options) of each filter, options are (value, count, selected) sorted by count"""
+        facets = []
+        for name, facet, queryset in (
+            ('brand', CategoryFacet.FACET_BRAND, Brand.objects.all()),
+            ('color', CategoryFacet.FACET_COLOR, Color.objects.all()),
+            (
+                'attribute_value', CategoryFacet.FACET_ATTRIBUTE_VALUE,
+                ProductAttributeValue.objects.select_related('product_attribute')
+            ),
+        ):
+            counts = self.facet_counts[facet]
+            if not counts:
+                continue
+            selected = self.filters.get(name, [])
+            values = sorted(queryset.filter(pk__in=counts), key=lambda value: -counts[value.id])
+            facets.append((name, [(value, counts[value.id], value.id in selected) for value in values]))
+        return facets
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(
+            category=self.category,
+            breadcrumb=get_category_tree().get_ancestors(self.category.id),
+            facets=self.get_facets(),
+            filters=self.filters,
+        )
+        return context
+
+
+class ProductSearchView(ProductVariantListMixin, ListView):
+    template_name = 'products/search.html'
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return ProductVariant.active_manager.none()
+        # results are ordered by relevance unless a sort is selected
+        sort_form = ListingSortForm(self.request.GET)
+        if sort_form.is_valid() and sort_form.cleaned_data['sort']:
+            self.sort = sort_form.cleaned_data['sort']
+            return sort_variants(search_variants(self.query), self.sort, self.get_price_field())
+        return search_variants(self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
+
+
+class ProductSuggestionView(View):
+    """Search as you type suggestions, served from in-process index without querying database"""
+    max_suggestions = 10
+
+    def get(self, request, *args, **kwargs):
+        suggestions = get_suggestion_index().suggest(request.GET.get('q', ''), get_language(), self.max_suggestions)
+        return JsonResponse({'suggestions': suggestions})
+
+
+class SitemapView(View):
+    """Serves a sitemap from cache, or streams it from database and caches it once it's fully sent"""
+    content_type = 'application/xml'
+
+    def get(self, request, *args, **kwargs):
+        base_url = f'{request.scheme}://{request.get_host()}'
+        name = self.get_name()
+        content = sitemaps.get_cached(name, base_url)
+        if content is not None:
+            return HttpResponse(content, content_type=self.content_type)
+        # checked before streaming starts, a streamed response can't turn into 404 later
+        self.check_exists()
+        return StreamingHttpResponse(
+            sitemaps.cache_when_sent(self.get_chunks(base_url), name, base_url), content_type=self.content_type
+        )
+
+    def get_name(self):
+        return 'index'
+
+    def check_exists(self):
+        """Raise Http404 when sitemap is missing, called only when it's not cached"""
+
+    def get_chunks(self, base_url):
+        return sitemaps.iter_index(base_url)
+
+
+class ProductSitemapView(SitemapView):
+
+    def get_name(self):
+        return f'products-{self.kwargs["page"]}'
+
+    def check_exists(self):
+        if not sitemaps.page_exists(self.kwargs['page']):
+            raise Http404
+
+    def get_chunks(self, base_url):
+        return sitemaps.iter_page(self.kwargs['page'], base_url)